@@ -0,0 +1,75 @@
+"""
+Cold start benchmark.
+
+Imports the app in a fresh interpreter under `python -X importtime` and
+fails if it pulls in any module that should only load on first use. Going
+over the time budget only warns, since wall-clock time on shared CI runners
+is noisy; pass --strict to fail on it too.
+
+    python bench/import_time.py
+    python bench/import_time.py --budget-ms 300 --runs 5 --strict
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must stay off the cold start path
+DEFERRED_MODULES = ["sqlalchemy", "psycopg2", "src.database", "src.api.admin", "src.api.analytics"]
+
+
+def measure_import(module: str) -> dict:
+    """
+    Import the module in a fresh interpreter and return the cumulative
+    import time in microseconds for every module it loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the app's import time against a budget.")
+    parser.add_argument("--module", default="src.api.server")
+    parser.add_argument("--budget-ms", type=float, default=400.0)
+    parser.add_argument("--runs", type=int, default=3, help="report the fastest of this many runs")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to list")
+    parser.add_argument("--strict", action="store_true", help="fail, rather than warn, when over budget")
+    args = parser.parse_args()
+
+    runs = [measure_import(args.module) for _ in range(args.runs)]
+    timings = min(runs, key=lambda run: run[args.module])
+    total_ms = timings[args.module] / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    for name, cumulative in sorted(timings.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    loaded = [module for module in DEFERRED_MODULES if module in timings]
+    if loaded:
+        print(f"FAIL: imported at startup but should be deferred: {', '.join(loaded)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"{'FAIL' if args.strict else 'WARNING'}: import time over budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = failed or args.strict
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Serialization microbenchmark.
+
+Compares the default FastAPI response path (a Pydantic model per row, then
+response_model validation, jsonable_encoder and json.dumps) with the
+rows_response path (row tuples straight to bytes with orjson) for the
+list-heavy endpoints.
+
+The wholesale plan case is what the real planner returns for the
+simulator's wholesale catalog, so it matches what the game server gets.
+
+    python bench/serialization.py
+    python bench/serialization.py --gold 5000 --iterations 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from src.api.barrels import Barrel, PurchaseRequest, compute_wholesale_purchase_plan
+from src.api.bottler import PotionInventory
+from src.api.catalog import CATALOG_FIELDS, CatalogItem
+from src.api.responses import rows_response
+from src.repository import InMemoryRepository
+from src.simulator import WHOLESALE_BARRELS
+
+
+def wholesale_plan(gold: int) -> list[tuple]:
+    # plan against the full wholesale catalog with only gold on hand
+    repo = InMemoryRepository()
+    repo.append_ledger([{"transaction_type": "reset", "gold_change": gold}])
+    catalog = [
+        Barrel(sku=sku, ml_per_barrel=ml_per_barrel, potion_type=potion_type, price=price, quantity=10)
+        for sku, ml_per_barrel, potion_type, price in WHOLESALE_BARRELS
+    ]
+    return compute_wholesale_purchase_plan(repo, catalog)
+
+
+def cases(gold: int) -> list[tuple]:
+    """
+    (name, model, fields, rows) for each endpoint shape.
+    """
+    return [
+        (
+            "wholesale plan",
+            PurchaseRequest,
+            ("sku", "quantity"),
+            wholesale_plan(gold),
+        ),
+        (
+            "bottle plan",
+            PotionInventory,
+            ("potion_type", "quantity"),
+            [([25, 25, 25, 25], i) for i in range(6)],
+        ),
+        (
+            "catalog",
+            CatalogItem,
+            CATALOG_FIELDS,
+            [(f"POTION_{i}", f"Potion {i}", 10, 50, [100, 0, 0, 0]) for i in range(6)],
+        ),
+    ]
+
+
+async def pydantic_path(model, fields, rows, field) -> bytes:
+    # what the endpoints did before: a model per row, then FastAPI's encoding
+    content = [model(**dict(zip(fields, row))) for row in rows]
+    encoded = await serialize_response(field=field, response_content=content, is_coroutine=False)
+    return JSONResponse(encoded).body
+
+
+async def rows_path(model, fields, rows, field) -> bytes:
+    return rows_response(fields, rows).body
+
+
+async def time_path(path, model, fields, rows, iterations: int) -> tuple:
+    # returns (microseconds per call, response body)
+    field = create_response_field(name="response", type_=list[model])
+    body = await path(model, fields, rows, field)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await path(model, fields, rows, field)
+    return (time.perf_counter() - started) / iterations * 1e6, body
+
+
+async def main(gold: int, iterations: int):
+    print(f"{'case':<16} {'rows':>6} {'pydantic us':>12} {'orjson us':>10} {'speedup':>8}")
+    for name, model, fields, case_rows in cases(gold):
+        slow, slow_body = await time_path(pydantic_path, model, fields, case_rows, iterations)
+        fast, fast_body = await time_path(rows_path, model, fields, case_rows, iterations)
+        # both paths must produce the same document
+        assert json.loads(slow_body) == json.loads(fast_body), name
+        print(f"{name:<16} {len(case_rows):>6} {slow:>12.1f} {fast:>10.1f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare response serialization paths.")
+    parser.add_argument("--gold", type=int, default=1000, help="gold on hand for the wholesale plan case")
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.gold, args.iterations))
@@ -26,6 +26,7 @@ CREATE TABLE inventory_ledger (
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  -- Time of the transaction
     transaction_type VARCHAR(50) NOT NULL,  -- Type of transaction ('bottling', 'purchase', 'barrel delivery', etc.)
     potion_type_id INT REFERENCES potion_types(id),  -- Potion type that was affected (nullable if it's an element change)
+    order_id INT,  -- Barrel/bottle order or cart the change came from (nullable for resets)
     num_red_ml_change INT DEFAULT 0,  -- Change in the number of red milliliters
     num_blue_ml_change INT DEFAULT 0,  -- Change in the number of blue milliliters
     num_green_ml_change INT DEFAULT 0,  -- Change in the number of green milliliters
@@ -34,6 +35,21 @@ CREATE TABLE inventory_ledger (
     potion_quantity_change INT DEFAULT 0  -- Change in potion quantity (+ for restock, - for sale)
 );
 
+--------------------
+-- LEDGER VERSION --
+--------------------
+-- Single row bumped in the same transaction as every ledger write, before
+-- its insert. The row lock makes ledger writes commit in version order and
+-- hands out ledger ids in commit order, so caches keyed on the version and
+-- the sales rollup watermark never miss a write that commits late. Insert
+-- into inventory_ledger only through the app, which takes this lock.
+CREATE TABLE ledger_version (
+    id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),  -- Only ever one row
+    version BIGINT NOT NULL DEFAULT 0  -- Number of ledger writes committed
+);
+
+INSERT INTO ledger_version DEFAULT VALUES;
+
 
 -------------------------
 -- CARTS TABLE --
@@ -67,6 +83,49 @@ VALUES
 ('RAINBOW_POTION_0', 'Rainbow Potion', 25, 25, 25, 25, 5);
 
 
+-------------------------
+-- GAME CLOCK TABLE --
+-------------------------
+-- Append-only record of every game clock tick; the newest row is the current time
+CREATE TABLE game_clock (
+    id SERIAL PRIMARY KEY,
+    day VARCHAR(20) NOT NULL,  -- Game day of the week (e.g., 'Edgeday')
+    hour INT NOT NULL,  -- Game hour (0-22, even hours)
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP  -- Time the tick was received
+);
+
+CREATE INDEX game_clock_created_at_idx ON game_clock (created_at);
+
+
+---------------------------------
+------ SALES ANALYTICS -----
+---------------------------------
+
+-------------------------
+-- SALES ROLLUPS TABLE --
+-------------------------
+-- Purchases from the ledger summed per potion type and game hour, updated incrementally
+CREATE TABLE sales_rollups (
+    potion_type_id INT REFERENCES potion_types(id) ON DELETE CASCADE,  -- Potion type sold
+    day VARCHAR(20) NOT NULL,  -- Game day the sales happened on ('unknown' before the first clock tick)
+    hour INT NOT NULL,  -- Game hour the sales happened in (-1 before the first clock tick)
+    quantity INT NOT NULL DEFAULT 0,  -- Potions sold
+    gold INT NOT NULL DEFAULT 0,  -- Gold taken in
+    PRIMARY KEY (potion_type_id, day, hour)
+);
+
+-----------------------------
+-- ROLLUP WATERMARKS TABLE --
+-----------------------------
+-- Highest inventory_ledger id already folded into each rollup
+CREATE TABLE rollup_watermarks (
+    name VARCHAR(50) PRIMARY KEY,  -- Rollup name (e.g., 'sales')
+    last_ledger_id INT NOT NULL DEFAULT 0  -- Ledger rows up to this id are included
+);
+
+INSERT INTO rollup_watermarks (name) VALUES ('sales');
+
+
 ----------------------
 -- GLOBAL INVENTORY VIEW --
 -----------------------
@@ -116,3 +175,41 @@ INSERT INTO cart_items (cart_id, potion_type_id, quantity, price, added_at) VALU
 (10, 3, 3, 150, '2023-01-03 12:05:00'),
 (11, 4, 1, 50, '2023-01-04 13:05:00'),
 (12, 5, 2, 10, '2023-01-05 14:05:00');
+
+
+----------------------------------------
+--  UPGRADING AN EXISTING DATABASE --
+----------------------------------------
+-- Everything above builds a fresh database. A database built from an older
+-- schema.sql (e.g., the live Supabase one) needs only the statements below,
+-- run before deploying; they are safe to run more than once.
+ALTER TABLE inventory_ledger ADD COLUMN IF NOT EXISTS order_id INT;
+
+CREATE TABLE IF NOT EXISTS ledger_version (
+    id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO ledger_version DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS game_clock (
+    id SERIAL PRIMARY KEY,
+    day VARCHAR(20) NOT NULL,
+    hour INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS game_clock_created_at_idx ON game_clock (created_at);
+
+CREATE TABLE IF NOT EXISTS sales_rollups (
+    potion_type_id INT REFERENCES potion_types(id) ON DELETE CASCADE,
+    day VARCHAR(20) NOT NULL,
+    hour INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 0,
+    gold INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (potion_type_id, day, hour)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    name VARCHAR(50) PRIMARY KEY,
+    last_ledger_id INT NOT NULL DEFAULT 0
+);
+INSERT INTO rollup_watermarks (name) VALUES ('sales') ON CONFLICT DO NOTHING;
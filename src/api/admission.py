@@ -0,0 +1,182 @@
+import asyncio
+import json
+import re
+from collections import deque
+
+
+class RouteClass:
+    """
+    Admission settings for a group of routes. Lower priority values are
+    served first when requests from several classes are waiting.
+    """
+
+    def __init__(self, name: str, priority: int, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+
+        self.active = 0
+        self.waiters = deque()
+        self.admitted = 0
+        self.rejected = 0
+
+
+class AdmissionController:
+    """
+    Caps how many requests run at once, overall and per route class, so a
+    burst of polling can't take every database connection away from the
+    game server's time-sensitive calls. Requests over the limit wait in a
+    bounded per-class queue and are rejected once it's full or they've
+    waited too long. All state lives on the event loop, so no locking.
+    """
+
+    def __init__(self, total_limit: int, route_classes: list[RouteClass], rules: list[tuple]):
+        self.total_limit = total_limit
+        self.active = 0
+        self.route_classes = {route_class.name: route_class for route_class in route_classes}
+        self._by_priority = sorted(route_classes, key=lambda route_class: route_class.priority)
+        # (method, compiled path pattern, route class name), first match wins
+        self._rules = [(method, re.compile(pattern), name) for method, pattern, name in rules]
+
+    def classify(self, method: str, path: str) -> str:
+        for rule_method, pattern, name in self._rules:
+            if rule_method in (method, "*") and pattern.match(path):
+                return name
+        return "standard"
+
+    def _can_run(self, route_class: RouteClass) -> bool:
+        return self.active < self.total_limit and route_class.active < route_class.limit
+
+    def _start(self, route_class: RouteClass) -> None:
+        self.active += 1
+        route_class.active += 1
+        route_class.admitted += 1
+
+    async def acquire(self, route_class: RouteClass) -> bool:
+        """
+        Wait for a slot for the route class. Returns False if the request
+        should be rejected instead.
+        """
+        if not route_class.waiters and self._can_run(route_class):
+            self._start(route_class)
+            return True
+
+        if len(route_class.waiters) >= route_class.queue_size:
+            route_class.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        route_class.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), route_class.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # granted just as the wait ran out, so take the slot
+                return True
+            route_class.waiters.remove(waiter)
+            waiter.cancel()
+            route_class.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(route_class)
+            elif waiter in route_class.waiters:
+                route_class.waiters.remove(waiter)
+            raise
+
+    def release(self, route_class: RouteClass) -> None:
+        self.active -= 1
+        route_class.active -= 1
+
+        # hand freed slots to the highest priority waiters
+        for waiting_class in self._by_priority:
+            while waiting_class.waiters and self._can_run(waiting_class):
+                waiter = waiting_class.waiters.popleft()
+                if not waiter.done():
+                    self._start(waiting_class)
+                    waiter.set_result(True)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "total_limit": self.total_limit,
+            "route_classes": {
+                name: {
+                    "priority": route_class.priority,
+                    "limit": route_class.limit,
+                    "active": route_class.active,
+                    "queue_depth": len(route_class.waiters),
+                    "queue_size": route_class.queue_size,
+                    "admitted": route_class.admitted,
+                    "rejected": route_class.rejected,
+                }
+                for name, route_class in self.route_classes.items()
+            },
+        }
+
+
+def default_controller() -> AdmissionController:
+    """
+    Route classes sized for SQLAlchemy's default pool of 5 connections plus
+    10 overflow.
+    """
+    return AdmissionController(
+        total_limit=12,
+        route_classes=[
+            RouteClass("critical", priority=0, limit=10, queue_size=50, max_wait=5.0),
+            RouteClass("standard", priority=1, limit=4, queue_size=20, max_wait=2.0),
+            RouteClass("polling", priority=2, limit=3, queue_size=10, max_wait=1.0),
+        ],
+        rules=[
+            ("POST", r"^/(bottler|barrels)/(deliver/[^/]+|plan)$", "critical"),
+            ("POST", r"^/carts/([^/]+/checkout|batch)$", "critical"),
+            ("POST", r"^/info/current_time$", "critical"),
+            ("POST", r"^/admin/reset$", "critical"),
+            ("GET", r"^/catalog/?$", "polling"),
+            ("GET", r"^/carts/search/?$", "polling"),
+        ],
+    )
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that admits HTTP requests through an AdmissionController
+    and answers 503 with Retry-After when a request is shed.
+    """
+
+    def __init__(self, app, controller: AdmissionController, exempt_paths: tuple = (), retry_after: int = 1):
+        self.app = app
+        self.controller = controller
+        self.exempt_paths = set(exempt_paths)
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self.controller.route_classes[self.controller.classify(scope["method"], scope["path"])]
+        if not await self.controller.acquire(route_class):
+            await self._reject(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
+
+    async def _reject(self, send):
+        body = json.dumps({"message": "Server is busy, please retry later", "data": None}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
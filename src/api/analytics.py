@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends
+from enum import Enum
+from src.api import auth
+from src.repository import get_repository
+from src.util import GAME_DAYS
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+    dependencies=[Depends(auth.get_api_key)],
+)
+
+class TopSellerSortOptions(str, Enum):
+    quantity = "quantity"
+    gold = "gold"
+
+def game_hour_order(day: str, hour: int) -> tuple:
+    # sales from before the first clock tick sort first
+    return (GAME_DAYS.index(day) if day in GAME_DAYS else -1, hour)
+
+def read_rollups(day: str) -> list[tuple]:
+    with get_repository().begin() as repo:
+        rows = repo.get_sales_rollups()
+    if day:
+        rows = [row for row in rows if row[2].lower() == day.lower()]
+    return rows
+
+@router.get("/top_sellers")
+def get_top_sellers(limit: int = 5, day: str = "", sort_col: TopSellerSortOptions = TopSellerSortOptions.gold):
+    """
+    Best selling potions by gold or quantity, optionally for a single game
+    day. Served from the sales rollups, which are refreshed each clock tick.
+    """
+    totals = {}
+    for _, sku, _, _, quantity, gold in read_rollups(day):
+        total = totals.setdefault(sku, {"sku": sku, "quantity": 0, "gold": 0})
+        total["quantity"] += quantity
+        total["gold"] += gold
+
+    return sorted(totals.values(), key=lambda total: total[sort_col.value], reverse=True)[:limit]
+
+@router.get("/sell_through")
+def get_sell_through():
+    """
+    For each potion, the share of everything stocked that has been sold:
+    potions sold / (potions sold + potions in stock).
+    """
+    with get_repository().begin() as repo:
+        rollups = repo.get_sales_rollups()
+        stock = repo.get_potion_stock()
+
+    sold = {}
+    for potion_type_id, _, _, _, quantity, _ in rollups:
+        sold[potion_type_id] = sold.get(potion_type_id, 0) + quantity
+
+    results = []
+    for row in stock:
+        potion_type_id, sku, in_stock = row[0], row[1], max(row[8], 0)
+        potions_sold = sold.get(potion_type_id, 0)
+        stocked = potions_sold + in_stock
+        results.append({
+            "sku": sku,
+            "sold": potions_sold,
+            "in_stock": in_stock,
+            "sell_through_rate": round(potions_sold / stocked, 3) if stocked else 0.0
+        })
+
+    return results
+
+@router.get("/gold_velocity")
+def get_gold_velocity(day: str = ""):
+    """
+    Gold taken in per elapsed game hour, optionally for a single game day,
+    along with the sales for each game hour that had any. Elapsed time comes
+    from the clock ticks recorded, each covering two game hours; sales from
+    before the first tick are listed but left out of the rate.
+    """
+    with get_repository().begin() as repo:
+        elapsed_hours = 2 * repo.count_game_ticks(day)
+
+    by_hour = {}
+    for _, _, rollup_day, hour, quantity, gold in read_rollups(day):
+        slot = by_hour.setdefault((rollup_day, hour), {"day": rollup_day, "hour": hour, "quantity": 0, "gold": 0})
+        slot["quantity"] += quantity
+        slot["gold"] += gold
+
+    clocked_gold = sum(slot["gold"] for (_, hour), slot in by_hour.items() if hour >= 0)
+    return {
+        "gold_per_hour": round(clocked_gold / elapsed_hours, 2) if elapsed_hours else 0.0,
+        "by_hour": [by_hour[key] for key in sorted(by_hour, key=lambda key: game_hour_order(*key))],
+    }
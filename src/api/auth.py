@@ -1,18 +1,21 @@
 from fastapi import Security, HTTPException, status, Request
 from fastapi.security.api_key import APIKeyHeader
+from functools import lru_cache
 import os
 import dotenv
 
-dotenv.load_dotenv()
+api_key_header = APIKeyHeader(name="access_token", auto_error=False)
 
-api_keys = []  
 
-api_keys.append(os.environ.get("API_KEY"))
-api_key_header = APIKeyHeader(name="access_token", auto_error=False)
+@lru_cache(maxsize=None)
+def get_api_keys() -> list:
+    # loaded on the first authenticated request rather than at import
+    dotenv.load_dotenv()
+    return [os.environ.get("API_KEY")]
 
 
 async def get_api_key(request: Request, api_key_header: str = Security(api_key_header)):
-    if api_key_header in api_keys:
+    if api_key_header in get_api_keys():
         return api_key_header
     else:
         raise HTTPException(
@@ -1,8 +1,11 @@
-import sqlalchemy
-from src import database as db
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+from src import plan_cache
 from src.api import auth
+from src.api.responses import rows_response
+from src.ledger import LedgerWriter
+from src.repository import get_repository
 from src.util import (
     INVENTORY_TABLE_NAME,
     get_ml_attribute_from_sku
@@ -29,64 +32,68 @@ class PurchaseRequest(BaseModel):
 
 @router.post("/deliver/{order_id}")
 def post_deliver_barrels(barrels_delivered: list[Barrel], order_id: int):
-    ml_types_to_update = []
-    barrel_costs = 0
-
+    # net the whole delivery into one ledger row: ml per color and the total cost
+    writer = LedgerWriter(order_id=order_id)
     for barrel in barrels_delivered:
-        ml = barrel.ml_per_barrel
-        ml_types_to_update.append((get_ml_attribute_from_sku(barrel.sku), ml))
-        barrel_costs += barrel.quantity * barrel.price
-
-    # update inventory ledger with the delivered barrels
-    insert_ledger_entries = [
-        {
-            'transaction_type': 'barrel delivery',
-            'potion_type_id': None,  # only ml changes, so no potion type
-            'num_red_ml_change': ml if attr == 'num_red_ml' else 0,
-            'num_blue_ml_change': ml if attr == 'num_blue_ml' else 0,
-            'num_green_ml_change': ml if attr == 'num_green_ml' else 0,
-            'num_dark_ml_change': ml if attr == 'num_dark_ml' else 0,
-            'gold_change': -barrel_costs if i == 0 else 0
-        }
-        for i, (attr, ml) in enumerate(ml_types_to_update)
-    ]
-
-    with db.engine.begin() as connection:
-        for entry in insert_ledger_entries:
-            connection.execute(
-                sqlalchemy.text(f"""
-                    INSERT INTO inventory_ledger (
-                        transaction_type, potion_type_id, num_red_ml_change, num_blue_ml_change,
-                        num_green_ml_change, num_dark_ml_change, gold_change
-                    )
-                    VALUES (:transaction_type, :potion_type_id, :num_red_ml_change, :num_blue_ml_change,
-                            :num_green_ml_change, :num_dark_ml_change, :gold_change)
-                """),
-                entry
-            )
+        writer.add(
+            'barrel delivery',
+            **{
+                f"{get_ml_attribute_from_sku(barrel.sku)}_change": barrel.ml_per_barrel * barrel.quantity,
+                'gold_change': -barrel.price * barrel.quantity,
+            },
+        )
+
+    with get_repository().begin() as repo:
+        writer.flush(repo)
 
     print(f"Barrels delivered: {barrels_delivered} for order ID: {order_id}")
     return "OK"
 
 
-@router.post("/plan")
-def get_wholesale_purchase_plan(wholesale_catalog: list[Barrel]) -> list[PurchaseRequest]:
-    requests = []
+@router.post("/plan", response_class=ORJSONResponse, response_model=list[PurchaseRequest])
+def get_wholesale_purchase_plan(wholesale_catalog: list[Barrel]):
+    return rows_response(("sku", "quantity"), wholesale_purchase_plan(wholesale_catalog))
+
+
+def wholesale_purchase_plan(wholesale_catalog: list[Barrel]) -> list[tuple]:
+    """
+    Return the barrel purchase plan as (sku, quantity) rows, reusing the one
+    precomputed on the last clock tick if the ledger and the wholesale
+    catalog haven't changed since.
+    """
     print("Wholesale catalog:", wholesale_catalog)
+    plan_cache.remember_wholesale_catalog(wholesale_catalog)
+
+    with get_repository().begin() as repo:
+        key = (repo.ledger_version(), wholesale_catalog_key(wholesale_catalog))
+        plan = plan_cache.get("barrels", key)
+        if plan is None:
+            plan = compute_wholesale_purchase_plan(repo, wholesale_catalog)
+            plan_cache.put("barrels", key, plan)
+
+    return plan
+
+
+def wholesale_catalog_key(wholesale_catalog: list[Barrel]) -> tuple:
+    return tuple(
+        (barrel.sku, barrel.ml_per_barrel, tuple(barrel.potion_type), barrel.price, barrel.quantity)
+        for barrel in wholesale_catalog
+    )
+
+
+def compute_wholesale_purchase_plan(repo, wholesale_catalog: list[Barrel]) -> list[tuple]:
+    # one (sku, 1) row per barrel to buy, in the order they were chosen
+    requests = []
 
-    select_gold_expression = f"SELECT SUM(gold_change), SUM(num_red_ml_change), SUM(num_green_ml_change), SUM(num_blue_ml_change), SUM(num_dark_ml_change) FROM inventory_ledger"
-    
     # get current amount of gold and milliliters of each type
-    with db.engine.begin() as connection:
-        result = connection.execute(sqlalchemy.text(select_gold_expression))
-        row = result.fetchone()
-        gold_plan = row[0]
-        ml_inventory = {
-            "num_red_ml": row[1],
-            "num_green_ml": row[2],
-            "num_blue_ml": row[3],
-            "num_dark_ml": row[4]
-        }
+    balances = repo.get_balances()
+    gold_plan = balances["gold"]
+    ml_inventory = {
+        "num_red_ml": balances["num_red_ml"],
+        "num_green_ml": balances["num_green_ml"],
+        "num_blue_ml": balances["num_blue_ml"],
+        "num_dark_ml": balances["num_dark_ml"]
+    }
     
     # calculate target ml quantity to even out all ml types
     total_ml = sum(ml_inventory.values())
@@ -94,20 +101,14 @@ def get_wholesale_purchase_plan(wholesale_catalog: list[Barrel]) -> list[Purchas
     target_ml = 100 if (total_ml / num_types) == 0 else (total_ml / num_types)
 
     # sort barrels by price to put cheaper first
-    wholesale_catalog.sort(key=lambda x: x.price)
-
-    for barrel in wholesale_catalog:
+    for barrel in sorted(wholesale_catalog, key=lambda x: x.price):
         ml_type = get_ml_attribute_from_sku(barrel.sku)
 
         # check if current ml type is less than target and if there's enough gold
         while ml_inventory[ml_type] < target_ml and gold_plan >= barrel.price:
-            purchase_request = PurchaseRequest(
-                sku=barrel.sku,
-                quantity=1
-            )
+            requests.append((barrel.sku, 1))
             gold_plan -= barrel.price
             ml_inventory[ml_type] += barrel.ml_per_barrel  # update the ml quantity based on the barrel
-            requests.append(purchase_request)
 
     return requests
 
@@ -1,10 +1,13 @@
-import sqlalchemy
 import math
-from src import database as db
 from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
 from enum import Enum
 from pydantic import BaseModel
-from src.api import auth 
+from src import plan_cache
+from src.api import auth
+from src.api.responses import rows_response
+from src.ledger import LedgerWriter
+from src.repository import get_repository
 
 
 router = APIRouter(
@@ -23,93 +26,69 @@ def post_deliver_bottles(potions_delivered: list[PotionInventory], order_id: int
     if not potions_delivered:
         return {"message": "No potions delivered", "order_id": order_id}
 
-    # prepare dictionaries to track how much of each element (r, g, b, d) to deduct
-    element_usage = {
-        "red": 0,
-        "green": 0,
-        "blue": 0,
-        "dark": 0
-    }
+    writer = LedgerWriter(order_id=order_id)
 
-    with db.engine.begin() as connection:
+    with get_repository().begin() as repo:
         for potion_inventory in potions_delivered:
             # get potion composition from the list [r, g, b, d]
             red_ml, green_ml, blue_ml, dark_ml = potion_inventory.potion_type
 
-            potion_type_query = sqlalchemy.text("""
-                SELECT id FROM potion_types
-                WHERE red = :red AND green = :green AND blue = :blue AND dark = :dark
-            """)
-            result = connection.execute(potion_type_query, {
-                "red": red_ml,
-                "green": green_ml,
-                "blue": blue_ml,
-                "dark": dark_ml
-            }).fetchone()
-
-            if not result:
+            potion_type_id = repo.find_potion_type_id(potion_inventory.potion_type)
+            if potion_type_id is None:
                 return {"message": "Potion type not found for the given composition", "order_id": order_id}
 
-            potion_type_id = result[0]
-
-            # calculate total ml usage for each element based on the potion composition and quantity
-            element_usage["red"] += red_ml * potion_inventory.quantity
-            element_usage["green"] += green_ml * potion_inventory.quantity
-            element_usage["blue"] += blue_ml * potion_inventory.quantity
-            element_usage["dark"] += dark_ml * potion_inventory.quantity
-
-            # insert ledger entry for the delivered potions
-            insert_ledger_entry = {
-                'transaction_type': 'bottling',
-                'potion_type_id': potion_type_id,  # no specific potion, just element changes
-                'num_red_ml_change': -element_usage["red"],
-                'num_blue_ml_change': -element_usage["blue"],
-                'num_green_ml_change': -element_usage["green"],
-                'num_dark_ml_change': -element_usage["dark"],
-                'gold_change': 0,
-                'potion_quantity_change': potion_inventory.quantity
-            }
-
-            connection.execute(
-                sqlalchemy.text(f"""
-                    INSERT INTO inventory_ledger (
-                        transaction_type, potion_type_id, num_red_ml_change, num_blue_ml_change,
-                        num_green_ml_change, num_dark_ml_change, gold_change, potion_quantity_change
-                    )
-                    VALUES (:transaction_type, :potion_type_id, :num_red_ml_change, :num_blue_ml_change,
-                            :num_green_ml_change, :num_dark_ml_change, :gold_change, :potion_quantity_change)
-                """),
-                insert_ledger_entry
+            # deduct only the ml this potion used; repeats of a potion net into one row
+            writer.add(
+                'bottling',
+                potion_type_id,
+                num_red_ml_change=-red_ml * potion_inventory.quantity,
+                num_blue_ml_change=-blue_ml * potion_inventory.quantity,
+                num_green_ml_change=-green_ml * potion_inventory.quantity,
+                num_dark_ml_change=-dark_ml * potion_inventory.quantity,
+                potion_quantity_change=potion_inventory.quantity,
             )
 
+        writer.flush(repo)
+
     print(f"Potions delivered: {potions_delivered} for order_id: {order_id}")
     return {"message": "Potions delivered successfully", "order_id": order_id}
 
 
-@router.post("/plan")
+@router.post("/plan", response_class=ORJSONResponse, response_model=list[PotionInventory])
 def get_bottle_plan():
+    return rows_response(("potion_type", "quantity"), bottle_plan())
+
+
+def bottle_plan() -> list[tuple]:
+    """
+    Return the bottle plan as (potion_type, quantity) rows, reusing the one
+    precomputed on the last clock tick if the ledger hasn't changed since.
+    """
+    with get_repository().begin() as repo:
+        ledger_version = repo.ledger_version()
+        plan = plan_cache.get("bottle", ledger_version)
+        if plan is None:
+            plan = compute_bottle_plan(repo)
+            plan_cache.put("bottle", ledger_version, plan)
+
+    return plan
+
+
+def compute_bottle_plan(repo) -> list[tuple]:
     requests = []
 
-    with db.engine.begin() as connection:
-
-        inventory_ledger_query = """
-            SELECT SUM(num_red_ml_change), SUM(num_blue_ml_change),
-                   SUM(num_green_ml_change), SUM(num_dark_ml_change)
-            FROM inventory_ledger
-        """
-        inventory_ledger = connection.execute(sqlalchemy.text(inventory_ledger_query)).fetchone()
-        inventory_ml = {
-            'red': inventory_ledger[0],
-            'blue': inventory_ledger[1],
-            'green': inventory_ledger[2],
-            'dark': inventory_ledger[3]
-        }
+    balances = repo.get_balances()
+    inventory_ml = {
+        'red': balances['num_red_ml'],
+        'blue': balances['num_blue_ml'],
+        'green': balances['num_green_ml'],
+        'dark': balances['num_dark_ml']
+    }
 
-        potion_types_query = """
-            SELECT id, sku, red, green, blue, dark
-            FROM potion_types
-        """
-        potion_types = connection.execute(sqlalchemy.text(potion_types_query)).fetchall()
+    potion_types = [
+        (potion_type_id, sku, red, green, blue, dark)
+        for potion_type_id, sku, _, _, red, green, blue, dark in repo.get_potion_types()
+    ]
 
     # organize potion types and calculate potion_type list [r, g, b, d]
     for potion in potion_types:
@@ -149,7 +128,7 @@ def get_bottle_plan():
                 int(elements['dark'])   # Dark
             ]
 
-            requests.append(PotionInventory(potion_type=potion_type, quantity=min_potion_quantity))
+            requests.append((potion_type, min_potion_quantity))
 
             # deduct used milliliters from the in-memory inventory
             for element, used_ml in ml_used_by_element.items():
@@ -159,4 +138,4 @@ def get_bottle_plan():
 
 
 if __name__ == "__main__":
-    print(get_bottle_plan())
+    print(bottle_plan())
@@ -1,9 +1,11 @@
-import sqlalchemy
-from src import database as db
 from fastapi import APIRouter, Depends, Request
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, conlist
+from src import pricing
 from src.api import auth
+from src.repository import get_repository
 from enum import Enum
+from typing import Optional
 
 router = APIRouter(
     prefix="/carts",
@@ -28,7 +30,14 @@ class OrderLineItem(BaseModel):
     line_item_total: int
     timestamp: str
 
-@router.get("/search/", tags=["search"])
+class OrderSearchResults(BaseModel):
+    previous: Optional[int]
+    next: Optional[int]
+    results: list[OrderLineItem]
+
+ORDER_LINE_ITEM_FIELDS = ("line_item_id", "item_sku", "customer_name", "line_item_total", "timestamp")
+
+@router.get("/search/", tags=["search"], response_class=ORJSONResponse, response_model=OrderSearchResults)
 def search_orders(
     customer_name: str = "",
     potion_sku: str = "",
@@ -64,47 +73,20 @@ def search_orders(
     limit = 5
     offset = (search_page - 1) * limit
 
-    with db.engine.begin() as connection:
-        order_search_query = sqlalchemy.text("""
-            SELECT potion_types.sku, carts.customer_name, cart_items.quantity, to_char(carts.created_at::timestamp, 'MM/DD/YYYY, HH12:MI:SS PM') as created_at
-            FROM carts
-            JOIN cart_items ON carts.id = cart_items.cart_id
-            JOIN potion_types ON potion_types.id = cart_items.potion_type_id
-            WHERE carts.customer_name ILIKE :customer_name
-            AND potion_types.sku ILIKE :potion_sku
-            ORDER BY 
-                CASE WHEN :sort_col = 'customer_name' AND :sort_order = 'asc' THEN carts.customer_name END ASC,
-                CASE WHEN :sort_col = 'customer_name' AND :sort_order = 'desc' THEN carts.customer_name END DESC,
-                CASE WHEN :sort_col = 'item_sku' AND :sort_order = 'asc' THEN potion_types.sku END ASC,
-                CASE WHEN :sort_col = 'item_sku' AND :sort_order = 'desc' THEN potion_types.sku END DESC,
-                CASE WHEN :sort_col = 'line_item_total' AND :sort_order = 'asc' THEN cart_items.quantity END ASC,
-                CASE WHEN :sort_col = 'line_item_total' AND :sort_order = 'desc' THEN cart_items.quantity END DESC,
-                CASE WHEN :sort_col = 'timestamp' AND :sort_order = 'asc' THEN carts.created_at END ASC,
-                CASE WHEN :sort_col = 'timestamp' AND :sort_order = 'desc' THEN carts.created_at END DESC
-            LIMIT :limit OFFSET :offset
-        """)
-        params = {
-            "customer_name": f"%{customer_name}%", 
-            "potion_sku": f"%{potion_sku}%", 
-            "sort_col": sort_col.value, 
-            "sort_order": sort_order.value, 
-            "limit": limit, 
-            "offset": offset
-        }
-        result = connection.execute(order_search_query, params)
-        orders = [
-            OrderLineItem(line_item_id=i, item_sku=row[0], customer_name=row[1], line_item_total=row[2], timestamp=row[3])
-            for i, row in enumerate(result)
-        ]
+    with get_repository().begin() as repo:
+        rows = repo.search_cart_items(
+            customer_name, potion_sku, sort_col.value, sort_order.value, limit, offset
+        )
+        orders = [dict(zip(ORDER_LINE_ITEM_FIELDS, (i,) + row)) for i, row in enumerate(rows)]
 
     previous_page = search_page - 1 if search_page > 1 else None
     next_page = search_page + 1 if len(orders) == limit else None
 
-    return {
+    return ORJSONResponse({
         "previous": previous_page,
         "next": next_page,
         "results": orders,
-    } 
+    })
 
 class Customer(BaseModel):
     customer_name: str
@@ -124,14 +106,8 @@ def create_cart(new_cart: Customer):
     """
     Create a new cart for the customer and store it in the database.
     """
-    with db.engine.begin() as connection:
-        insert_cart_query = sqlalchemy.text("""
-            INSERT INTO carts (customer_name) 
-            VALUES (:customer_name)
-            RETURNING id
-        """)
-        result = connection.execute(insert_cart_query, {"customer_name": new_cart.customer_name})
-        cart_id = result.fetchone()[0]
+    with get_repository().begin() as repo:
+        cart_id = repo.create_cart(new_cart.customer_name)
 
     return {"cart_id": cart_id}
 
@@ -143,61 +119,23 @@ def set_item_quantity(cart_id: int, item_sku: str, cart_item: CartItem):
     """
     Add an item to the cart by SKU and quantity.
     """
-    with db.engine.begin() as connection:
+    with get_repository().begin() as repo:
         # check if the cart exists
-        select_cart_query = sqlalchemy.text("""
-            SELECT id FROM carts WHERE id = :cart_id
-        """)
-        result = connection.execute(select_cart_query, {"cart_id": cart_id})
-        if not result.fetchone():
+        if repo.get_cart_customer(cart_id) is None:
             return {"error": "Cart not found"}
 
         # check if the item exists in the potion_types table by SKU
-        select_potion_query = sqlalchemy.text("""
-            SELECT id, price FROM potion_types WHERE sku = :item_sku
-        """)
-        result = connection.execute(select_potion_query, {"item_sku": item_sku})
-        potion = result.fetchone()
+        potion = repo.get_potion_by_sku(item_sku)
         if not potion:
             return {"error": "Item not found in potion_types"}
 
-        potion_type_id, item_price = potion
-
-        # check if the item already exists in the cart_items table
-        select_cart_item_query = sqlalchemy.text("""
-            SELECT quantity FROM cart_items
-            WHERE cart_id = :cart_id AND potion_type_id = :potion_type_id
-        """)
-        result = connection.execute(select_cart_item_query, {
-            "cart_id": cart_id,
-            "potion_type_id": potion_type_id
-        })
-        existing_item = result.fetchone()
-
-        if existing_item:
-            # if the item exists, update the quantity
-            update_item_query = sqlalchemy.text("""
-                UPDATE cart_items
-                SET quantity = quantity + :quantity
-                WHERE cart_id = :cart_id AND potion_type_id = :potion_type_id
-            """)
-            connection.execute(update_item_query, {
-                "cart_id": cart_id,
-                "potion_type_id": potion_type_id,
-                "quantity": cart_item.quantity
-            })
-        else:
-            # if the item does not exist, insert it
-            insert_item_query = sqlalchemy.text("""
-                INSERT INTO cart_items (cart_id, potion_type_id, quantity, price)
-                VALUES (:cart_id, :potion_type_id, :quantity, :price)
-            """)
-            connection.execute(insert_item_query, {
-                "cart_id": cart_id,
-                "potion_type_id": potion_type_id,
-                "quantity": cart_item.quantity,
-                "price": item_price
-            })
+        # quote the current price; checkout charges what was quoted here
+        potion_type_id, _ = potion
+        item_price = pricing.current_prices(repo)[item_sku]
+
+        # add the item to the cart, or increase its quantity if it's already there at
+        # this price; a new quote gets its own line so each unit is charged its quote
+        repo.add_cart_item(cart_id, potion_type_id, cart_item.quantity, item_price)
 
     return {"success": True}
 
@@ -209,56 +147,18 @@ def checkout(cart_id: int, cart_checkout: CartCheckout):
     """
     Perform checkout for the cart, calculate total cost, and update catalog inventory.
     """
-    with db.engine.begin() as connection:
+    with get_repository().begin() as repo:
         # check if the cart exists
-        select_cart_query = sqlalchemy.text("""
-            SELECT customer_name FROM carts WHERE id = :cart_id
-        """)
-        result = connection.execute(select_cart_query, {"cart_id": cart_id})
-        cart = result.fetchone()
-        if not cart:
+        if repo.get_cart_customer(cart_id) is None:
             return {"error": "Cart not found"}
 
-        # retrieve cart items and calculate total cost
-        select_items_query = sqlalchemy.text("""
-            SELECT ci.potion_type_id, ci.quantity, ci.price, pt.sku
-            FROM cart_items ci
-            JOIN potion_types pt ON ci.potion_type_id = pt.id
-            WHERE ci.cart_id = :cart_id
-        """)
-        cart_items = connection.execute(select_items_query, {"cart_id": cart_id}).fetchall()
+        # record the purchase in the ledger and delete the cart and its items
+        totals = repo.checkout_carts([cart_id])
 
-        if not cart_items:
+        if cart_id not in totals:
             return {"error": "No items in cart"}
 
-        total_potions_bought = 0
-        total_gold_paid = 0
-
-        for item in cart_items:
-            potion_type_id, quantity, price, sku = item
-            total_gold_for_item = price * quantity
-            total_gold_paid += total_gold_for_item
-            total_potions_bought += quantity
-
-            # insert a ledger entry for the purchased items
-            insert_ledger_entry = sqlalchemy.text("""
-                INSERT INTO inventory_ledger (
-                    transaction_type, potion_type_id, potion_quantity_change, gold_change
-                )
-                VALUES ('purchase', :potion_type_id, -:quantity, :gold_change)
-            """)
-            connection.execute(insert_ledger_entry, {
-                "potion_type_id": potion_type_id,
-                "quantity": quantity,
-                "gold_change": total_gold_for_item
-            })
-        
-        # delete the cart items and the cart after successful checkout
-        delete_cart_and_items_query = sqlalchemy.text("""
-            DELETE FROM cart_items WHERE cart_id = :cart_id;
-            DELETE FROM carts WHERE id = :cart_id;
-        """)
-        connection.execute(delete_cart_and_items_query, {"cart_id": cart_id})
+        total_potions_bought, total_gold_paid = totals[cart_id]
 
     return {
         "total_potions_bought": total_potions_bought,
@@ -266,4 +166,120 @@ def checkout(cart_id: int, cart_checkout: CartCheckout):
         "message": "Checkout successful"
     }
 
-
+class CartOperationType(str, Enum):
+    create = "create"
+    set_item = "set_item"
+    checkout = "checkout"
+
+class CartOperation(BaseModel):
+    op: CartOperationType
+    ref: Optional[str] = None  # names a cart created in this batch
+    cart_id: Optional[int] = None
+    customer: Optional[Customer] = None
+    item_sku: Optional[str] = None
+    quantity: Optional[int] = None
+    payment: Optional[str] = None
+
+# a batch holds a critical admission slot and a connection until it finishes
+MAX_BATCH_OPERATIONS = 500
+
+@router.post("/batch")
+def batch_cart_operations(operations: conlist(CartOperation, max_items=MAX_BATCH_OPERATIONS)):
+    """
+    Apply many cart operations, possibly for many customers, in a single
+    transaction so a whole tick's worth of purchases costs one request.
+
+    Operations are applied in phases: every create first, then every item
+    update, then every checkout. Item updates and checkouts refer to a cart
+    either by cart_id or by the ref given to a create in the same batch.
+    An item update that comes after a checkout of the same cart in the
+    request is rejected rather than charged in that checkout. The response
+    holds one result per operation, in request order, shaped like the
+    response of the matching single-cart endpoint. Batches of more than
+    MAX_BATCH_OPERATIONS operations are rejected with a 422.
+    """
+    results = [None] * len(operations)
+    creates = []
+    set_items = []
+    checkouts = []
+
+    for i, operation in enumerate(operations):
+        if operation.op == CartOperationType.create:
+            if operation.customer is None:
+                results[i] = {"error": "Customer is required to create a cart"}
+            else:
+                creates.append(i)
+        elif operation.op == CartOperationType.set_item:
+            if operation.item_sku is None or operation.quantity is None:
+                results[i] = {"error": "Item sku and quantity are required"}
+            else:
+                set_items.append(i)
+        else:
+            checkouts.append(i)
+
+    with get_repository().begin() as repo:
+        # create every new cart in one statement
+        new_cart_ids = repo.create_carts([operations[i].customer.customer_name for i in creates])
+        refs = {}
+        for i, cart_id in zip(creates, new_cart_ids):
+            results[i] = {"cart_id": cart_id}
+            if operations[i].ref is not None:
+                refs[operations[i].ref] = cart_id
+
+        # resolve the cart each remaining operation targets
+        targets = {}
+        for i in set_items + checkouts:
+            operation = operations[i]
+            targets[i] = refs.get(operation.ref) if operation.ref is not None else operation.cart_id
+        existing_carts = repo.get_existing_cart_ids(
+            list({cart_id for cart_id in targets.values() if cart_id is not None})
+        )
+
+        # checkouts run after every item update, so keep items the request
+        # added to a cart after checking it out from landing in that checkout
+        checked_out_before = set()
+        late_items = set()
+        for i in sorted(targets):
+            if operations[i].op == CartOperationType.checkout:
+                checked_out_before.add(targets[i])
+            elif targets[i] in checked_out_before:
+                late_items.add(i)
+
+        # add every item in one pass, priced as the single-cart endpoint does
+        potions = repo.get_potions_by_skus(list({operations[i].item_sku for i in set_items}))
+        prices = pricing.current_prices(repo) if potions else {}
+        new_items = []
+        for i in set_items:
+            potion = potions.get(operations[i].item_sku)
+            if targets[i] not in existing_carts:
+                results[i] = {"error": "Cart not found"}
+            elif i in late_items:
+                results[i] = {"error": "Cart already checked out"}
+            elif not potion:
+                results[i] = {"error": "Item not found in potion_types"}
+            else:
+                potion_type_id, _ = potion
+                new_items.append((targets[i], potion_type_id, operations[i].quantity, prices[operations[i].item_sku]))
+                results[i] = {"success": True}
+        repo.add_cart_items(new_items)
+
+        # check out every cart at once; a cart can only be checked out once
+        checkout_cart_ids = list(dict.fromkeys(targets[i] for i in checkouts if targets[i] in existing_carts))
+        totals = repo.checkout_carts(checkout_cart_ids)
+        checked_out = set()
+        for i in checkouts:
+            cart_id = targets[i]
+            if cart_id not in existing_carts or cart_id in checked_out:
+                results[i] = {"error": "Cart not found"}
+            elif cart_id not in totals:
+                results[i] = {"error": "No items in cart"}
+            else:
+                checked_out.add(cart_id)
+                total_potions_bought, total_gold_paid = totals[cart_id]
+                results[i] = {
+                    "total_potions_bought": total_potions_bought,
+                    "total_gold_paid": total_gold_paid,
+                    "message": "Checkout successful"
+                }
+
+    return results
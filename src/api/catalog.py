@@ -1,8 +1,9 @@
-import sqlalchemy
-from src import database as db
 from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from src.util import POTION_TYPES_TABLE_NAME
+from src import plan_cache, pricing
+from src.api.responses import rows_response
+from src.repository import get_repository
 
 router = APIRouter()
 
@@ -13,33 +14,35 @@ class CatalogItem(BaseModel):
     price: int
     potion_type: list[int]  # array of percentages [r, g, b, d]
 
-@router.get("/catalog/", tags=["catalog"])
+CATALOG_FIELDS = ("sku", "name", "quantity", "price", "potion_type")
+
+@router.get("/catalog/", tags=["catalog"], response_class=ORJSONResponse, response_model=list[CatalogItem])
 def get_catalog():
+    return rows_response(CATALOG_FIELDS, catalog_rows())
+
+def catalog_rows() -> list[tuple]:
+    """
+    Every potion in stock as a row of CATALOG_FIELDS, priced by the pricing
+    engine. Stock and prices only change with the ledger, so the rows are
+    cached against the ledger version.
+    """
+    with get_repository().begin() as repo:
+        ledger_version = repo.ledger_version()
+        catalog = plan_cache.get("catalog", ledger_version)
+        if catalog is not None:
+            return catalog
+
+        rows = repo.get_potion_stock()
+        prices = pricing.current_prices(repo, rows)
+
+    # construct potion type percentages for each catalog item that's in stock
     catalog = []
+    for row in rows:
+        if row[8] <= 0:
+            continue
+        potion_type_percentages = [row[4], row[5], row[6], row[7]]
+        catalog.append((row[1], row[2], row[8], prices[row[1]], potion_type_percentages))
 
-    with db.engine.begin() as connection:
-        catalog_query = f"""
-        SELECT pt.sku, pt.name, pt.price, COALESCE(SUM(il.potion_quantity_change), 0) AS quantity, pt.red, pt.green, pt.blue, pt.dark
-        FROM {POTION_TYPES_TABLE_NAME} pt
-        LEFT JOIN inventory_ledger il ON pt.id = il.potion_type_id
-        GROUP BY pt.id, pt.sku, pt.name, pt.price, pt.red, pt.green, pt.blue, pt.dark
-        HAVING COALESCE(SUM(il.potion_quantity_change), 0) > 0
-        """
-        result = connection.execute(sqlalchemy.text(catalog_query))
-        rows = result.fetchall()
-
-        # construct potion type percentages for each catalog item
-        for row in rows:
-            potion_type_percentages = [row[4], row[5], row[6], row[7]]
-
-            catalog_item = CatalogItem(
-                sku=row[0],
-                name=row[1],
-                quantity=row[3],
-                price=row[2],
-                potion_type=potion_type_percentages
-            )
-            catalog.append(catalog_item)
-
+    plan_cache.put("catalog", ledger_version, catalog)
     return catalog
 
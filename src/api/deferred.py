@@ -0,0 +1,31 @@
+import importlib
+
+
+class DeferredRouters:
+    """
+    ASGI middleware that imports rarely used routers on the first request
+    under their prefix instead of at startup. The docs and OpenAPI schema
+    load every deferred router so they stay complete.
+    """
+
+    def __init__(self, app, fastapi_app, routers: dict):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        # path prefix -> module whose `router` serves it
+        self.pending = dict(routers)
+
+    def _include(self, prefix: str) -> None:
+        module = importlib.import_module(self.pending.pop(prefix))
+        self.fastapi_app.include_router(module.router)
+        # rebuild the schema on the next request for it
+        self.fastapi_app.openapi_schema = None
+
+    async def __call__(self, scope, receive, send):
+        if self.pending and scope["type"] == "http":
+            path = scope["path"]
+            for prefix in list(self.pending):
+                # match whole path segments so e.g. /adminx doesn't load /admin
+                under_prefix = path == prefix or path.startswith(prefix + "/")
+                if under_prefix or path in ("/docs", "/openapi.json"):
+                    self._include(prefix)
+        await self.app(scope, receive, send)
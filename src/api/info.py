@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from pydantic import BaseModel
-from src.api import auth
+from src import plan_cache, pricing
+from src.api import auth, barrels, bottler
+from src.repository import get_repository
 
 router = APIRouter(
     prefix="/info",
@@ -13,10 +15,17 @@ class Timestamp(BaseModel):
     hour: int
 
 @router.post("/current_time")
-def post_time(timestamp: Timestamp):
+def post_time(timestamp: Timestamp, background_tasks: BackgroundTasks):
     """
     Share current time.
     """
+    with get_repository().begin() as repo:
+        repo.record_game_time(timestamp.day, timestamp.hour)
+
+    # get the plans ready before the game server asks for them this tick
+    background_tasks.add_task(precompute_plans)
+    background_tasks.add_task(refresh_sales_rollups)
+
     return {
         "current_time": {
             "day": timestamp.day,
@@ -25,3 +34,26 @@ def post_time(timestamp: Timestamp):
         "message": f"The current time is {timestamp.hour}:00 on {timestamp.day}."
     }
 
+def precompute_plans():
+    """
+    Compute the bottle plan, the barrel plan for the last wholesale catalog
+    seen and the potion prices, and cache them against the current ledger
+    version.
+    """
+    wholesale_catalog = plan_cache.last_wholesale_catalog()
+
+    with get_repository().begin() as repo:
+        ledger_version = repo.ledger_version()
+        plan_cache.put("bottle", ledger_version, bottler.compute_bottle_plan(repo))
+        pricing.current_prices(repo)
+
+        if wholesale_catalog is not None:
+            key = (ledger_version, barrels.wholesale_catalog_key(wholesale_catalog))
+            plan_cache.put("barrels", key, barrels.compute_wholesale_purchase_plan(repo, wholesale_catalog))
+
+def refresh_sales_rollups():
+    """
+    Fold purchases recorded since the last refresh into the sales rollups.
+    """
+    with get_repository().begin() as repo:
+        repo.refresh_sales_rollups()
@@ -1,8 +1,7 @@
-import sqlalchemy
-from src import database as db
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from src.api import auth
+from src.repository import get_repository
 
 
 router = APIRouter(
@@ -16,23 +15,15 @@ def get_inventory():
     """
     Retrieve and audit the current inventory, including potions, milliliters, and gold.
     """
-    select_expression_inventory = f"""
-        SELECT COALESCE(SUM(gold_change), 0) AS gold, 
-               COALESCE(SUM(num_red_ml_change + num_green_ml_change + num_blue_ml_change + num_dark_ml_change), 0) AS total_ml
-        FROM inventory_ledger
-    """
-    select_expression_catalog = f"SELECT COALESCE(SUM(potion_quantity_change), 0) AS total_potions FROM inventory_ledger"
-    
-    with db.engine.begin() as connection:
-        # get milliliters and gold from inventory ledger
-        result_inventory = connection.execute(sqlalchemy.text(select_expression_inventory))
-        row_inventory = result_inventory.fetchone()
-        ml_inventory = row_inventory[1]
-        gold_inventory = row_inventory[0]
-        
-        # get potion quantities for each potion type from inventory ledger
-        result_catalog = connection.execute(sqlalchemy.text(select_expression_catalog))
-        potions_inventory = result_catalog.fetchone()[0]
+    with get_repository().begin() as repo:
+        balances = repo.get_balances()
+
+    # milliliters and gold from the inventory ledger
+    ml_inventory = (
+        balances["num_red_ml"] + balances["num_green_ml"] + balances["num_blue_ml"] + balances["num_dark_ml"]
+    )
+    gold_inventory = balances["gold"]
+    potions_inventory = balances["potions"]
     
     return {
         "potions": potions_inventory,
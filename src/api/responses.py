@@ -0,0 +1,12 @@
+from fastapi.responses import ORJSONResponse
+
+
+def rows_response(fields: tuple, rows) -> ORJSONResponse:
+    """
+    Serialize row tuples straight to JSON bytes as objects keyed by fields.
+
+    Returning a response object skips FastAPI's per-row validation and
+    jsonable_encoder pass. Routes using this still declare response_model
+    for the docs, so the rows must already match that schema.
+    """
+    return ORJSONResponse([dict(zip(fields, row)) for row in rows])
@@ -1,9 +1,13 @@
-from fastapi import FastAPI, exceptions
+from fastapi import Depends, FastAPI, Request, exceptions
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
-from src.api import carts, catalog, bottler, barrels, admin, info, inventory
+from src.api import carts, catalog, bottler, barrels, info, inventory, auth
+from src.api.admission import AdmissionMiddleware, default_controller
+from src.api.deferred import DeferredRouters
 import json
 import logging
+import os
 import sys
 from starlette.middleware.cors import CORSMiddleware
 
@@ -11,46 +15,88 @@ description = """
 slopotionco is the premier ecommerce site for all your alchemical desires.
 """
 
-app = FastAPI(
-    title="slopotionco",
-    description=description,
-    version="0.0.1",
-    terms_of_service="http://example.com/terms/",
-    contact={
-        "name": "Yasemin Akkaya",
-        "email": "yakkaya@calpoly.edu",
-    },
-)
-
 origins = ["https://potion-exchange.vercel.app"]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["GET", "OPTIONS"],
-    allow_headers=["*"],
-)
-
-app.include_router(inventory.router)
-app.include_router(carts.router)
-app.include_router(catalog.router)
-app.include_router(bottler.router)
-app.include_router(barrels.router)
-app.include_router(admin.router)
-app.include_router(info.router)
-
-@app.exception_handler(exceptions.RequestValidationError)
-@app.exception_handler(ValidationError)
-async def validation_exception_handler(request, exc):
-    logging.error(f"The client sent invalid data!: {exc}")
-    exc_json = json.loads(exc.json())
-    response = {"message": [], "data": None}
-    for error in exc_json:
-        response['message'].append(f"{error['loc']}: {error['msg']}")
-
-    return JSONResponse(response, status_code=422)
-
-@app.get("/")
-async def root():
-    return {"message": "Welcome to the Central Coast Cauldrons."}
+# routers that are rarely called, imported on their first request
+deferred_routers = {
+    "/admin": "src.api.admin",
+    "/analytics": "src.api.analytics",
+}
+
+def create_app() -> FastAPI:
+    """
+    Build the application. Nothing here touches the database or loads the
+    environment; both happen on first use so cold starts stay cheap.
+    """
+    app = FastAPI(
+        title="slopotionco",
+        description=description,
+        version="0.0.1",
+        terms_of_service="http://example.com/terms/",
+        contact={
+            "name": "Yasemin Akkaya",
+            "email": "yakkaya@calpoly.edu",
+        },
+    )
+
+    app.add_middleware(DeferredRouters, fastapi_app=app, routers=deferred_routers)
+
+    # shed load per route class so polling can't starve the game server's calls
+    app.state.admission_controller = default_controller()
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=app.state.admission_controller,
+        exempt_paths=("/", "/admission", "/docs", "/openapi.json"),
+    )
+
+    # added last so it's outermost and shed requests' 503s still carry CORS headers
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["GET", "OPTIONS"],
+        allow_headers=["*"],
+        expose_headers=["Retry-After"],
+    )
+
+    app.include_router(inventory.router)
+    app.include_router(carts.router)
+    app.include_router(catalog.router)
+    app.include_router(bottler.router)
+    app.include_router(barrels.router)
+    app.include_router(info.router)
+
+    @app.on_event("startup")
+    async def warm_up_database():
+        # optionally open pooled connections before the first request
+        connections = int(os.environ.get("WARM_DB_CONNECTIONS", "0"))
+        if connections and os.environ.get("STORAGE_BACKEND", "postgres") == "postgres":
+            from src import database as db
+
+            await run_in_threadpool(db.warm_up, connections)
+
+    @app.exception_handler(exceptions.RequestValidationError)
+    @app.exception_handler(ValidationError)
+    async def validation_exception_handler(request, exc):
+        logging.error(f"The client sent invalid data!: {exc}")
+        exc_json = json.loads(exc.json())
+        response = {"message": [], "data": None}
+        for error in exc_json:
+            response['message'].append(f"{error['loc']}: {error['msg']}")
+
+        return JSONResponse(response, status_code=422)
+
+    @app.get("/")
+    async def root():
+        return {"message": "Welcome to the Central Coast Cauldrons."}
+
+    @app.get("/admission", dependencies=[Depends(auth.get_api_key)])
+    async def get_admission_stats(request: Request):
+        """
+        Current concurrency, queue depth and rejection counters per route class.
+        """
+        return request.app.state.admission_controller.stats()
+
+    return app
+
+app = create_app()
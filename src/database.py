@@ -1,5 +1,6 @@
 import os
 import dotenv
+from functools import lru_cache
 from sqlalchemy import create_engine
 
 def database_connection_url():
@@ -7,4 +8,25 @@ def database_connection_url():
 
     return os.environ.get("POSTGRES_URI")
 
-engine = create_engine(database_connection_url(), pool_pre_ping=True)
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_engine():
+    """
+    Create the engine on first use rather than at import, so cold starts
+    don't pay for it before the first request that needs the database.
+    """
+    return create_engine(database_connection_url(), pool_pre_ping=True)
+
+def warm_up(connections: int):
+    """
+    Open the given number of connections and close them back into the pool,
+    so the first requests don't pay for connecting.
+    """
+    opened = [get_engine().connect() for _ in range(connections)]
+    for connection in opened:
+        connection.close()
+
+def __getattr__(name):
+    # keep db.engine working for existing callers
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,81 @@
+from typing import Optional
+
+# numeric change columns of an inventory ledger row
+LEDGER_DELTA_COLUMNS = [
+    "num_red_ml_change",
+    "num_blue_ml_change",
+    "num_green_ml_change",
+    "num_dark_ml_change",
+    "gold_change",
+    "potion_quantity_change",
+]
+
+# columns of a single inventory ledger row, in insert order
+LEDGER_COLUMNS = ["transaction_type", "potion_type_id", "order_id"] + LEDGER_DELTA_COLUMNS
+
+
+class LedgerWriter:
+    """
+    The one write path into the inventory ledger. Deltas added during a
+    request are validated, netted into a single row per (transaction type,
+    potion type, order id) and written with one multi-row insert, each row
+    stamped with the order it came from.
+
+        writer = LedgerWriter(order_id=order_id)
+        writer.add("barrel delivery", num_red_ml_change=500, gold_change=-100)
+        writer.flush(repo)
+    """
+
+    def __init__(self, order_id: Optional[int] = None):
+        self.order_id = order_id
+        self._rows = {}
+
+    def add(
+        self,
+        transaction_type: str,
+        potion_type_id: Optional[int] = None,
+        order_id: Optional[int] = None,
+        **changes: int,
+    ) -> None:
+        """
+        Add deltas to the row for this transaction type, potion type and
+        order. The order defaults to the writer's.
+        """
+        if not isinstance(transaction_type, str) or not transaction_type:
+            raise ValueError(f"Invalid transaction type: {transaction_type!r}")
+        if potion_type_id is not None and (not isinstance(potion_type_id, int) or isinstance(potion_type_id, bool)):
+            raise ValueError(f"Invalid potion type id: {potion_type_id!r}")
+        for column, change in changes.items():
+            if column not in LEDGER_DELTA_COLUMNS:
+                raise ValueError(f"Invalid ledger column: {column}")
+            if not isinstance(change, int) or isinstance(change, bool):
+                raise ValueError(f"Invalid change for {column}: {change!r}")
+
+        if order_id is None:
+            order_id = self.order_id
+        key = (transaction_type, potion_type_id, order_id)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = dict.fromkeys(LEDGER_DELTA_COLUMNS, 0)
+        for column, change in changes.items():
+            row[column] += change
+
+    def rows(self) -> list[dict]:
+        """
+        The netted rows, leaving out any whose changes cancelled to zero.
+        """
+        return [
+            {"transaction_type": transaction_type, "potion_type_id": potion_type_id, "order_id": order_id, **changes}
+            for (transaction_type, potion_type_id, order_id), changes in self._rows.items()
+            if any(changes.values())
+        ]
+
+    def flush(self, repo) -> int:
+        """
+        Write the netted rows through the repository and start over.
+        Returns the number of rows written.
+        """
+        rows = self.rows()
+        repo.append_ledger(rows)
+        self._rows = {}
+        return len(rows)
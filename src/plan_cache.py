@@ -0,0 +1,41 @@
+import threading
+
+# plans, prices and the catalog, keyed on the ledger version they were computed from
+_plans = {}
+_lock = threading.Lock()
+
+# the most recent wholesale catalog sent to /barrels/plan
+_last_wholesale_catalog = None
+
+
+def get(name: str, key):
+    """
+    Return the cached plan for name if it was computed for the same key,
+    otherwise None.
+    """
+    with _lock:
+        cached = _plans.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    return None
+
+
+def put(name: str, key, plan) -> None:
+    with _lock:
+        _plans[name] = (key, plan)
+
+
+def clear() -> None:
+    global _last_wholesale_catalog
+    with _lock:
+        _plans.clear()
+        _last_wholesale_catalog = None
+
+
+def remember_wholesale_catalog(wholesale_catalog: list) -> None:
+    global _last_wholesale_catalog
+    _last_wholesale_catalog = list(wholesale_catalog)
+
+
+def last_wholesale_catalog():
+    return _last_wholesale_catalog
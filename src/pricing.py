@@ -0,0 +1,63 @@
+import math
+
+from src import plan_cache
+
+# ledger rows considered "recent" for sales velocity and ml cost
+ACTIVITY_WINDOW = 500
+
+# gold per ml assumed before any barrels have been bought (a 500 ml barrel for 100 gold)
+DEFAULT_ML_COST = 0.2
+
+ML_PER_POTION = 100
+MIN_MARGIN = 1.2  # never sell below 120% of the ml that went into the potion
+DEMAND_WEIGHT = 0.25  # +25% for each multiple of the average sales rate above it
+MAX_DEMAND = 3.0  # cap on how far demand can push a price up
+STOCK_WEIGHT = 0.2  # up to 20% off for a potion filling the whole potion capacity
+POTION_CAPACITY = 50
+MIN_PRICE = 1
+MAX_PRICE = 500
+
+
+def compute_prices(potions: list[tuple], activity: dict) -> dict:
+    """
+    Price every potion in one pass over columns of get_potion_stock() rows
+    and get_recent_activity(). Each price starts from the listed price,
+    raised to cover the ml cost, then moves up with sales velocity relative
+    to the other potions and down as stock fills the potion capacity.
+    Returns sku -> price.
+    """
+    if not potions:
+        return {}
+
+    skus = [potion[1] for potion in potions]
+    listed = [potion[3] for potion in potions]
+    stock = [max(potion[8], 0) for potion in potions]
+    sold = [activity["sales"].get(potion[0], 0) for potion in potions]
+
+    ml_cost = activity["barrel_gold"] / activity["barrel_ml"] if activity["barrel_ml"] > 0 else DEFAULT_ML_COST
+    floor = max(MIN_PRICE, math.ceil(ml_cost * ML_PER_POTION * MIN_MARGIN))
+
+    mean_sold = sum(sold) / len(sold)
+
+    prices = [
+        max(listed_price, floor)
+        * (1 + DEMAND_WEIGHT * (min(potion_sold / mean_sold, MAX_DEMAND) - 1 if mean_sold else 0))
+        * (1 - STOCK_WEIGHT * min(potion_stock / POTION_CAPACITY, 1))
+        for listed_price, potion_sold, potion_stock in zip(listed, sold, stock)
+    ]
+    return {sku: min(max(round(price), floor), MAX_PRICE) for sku, price in zip(skus, prices)}
+
+
+def current_prices(repo, potions: list[tuple] = None) -> dict:
+    """
+    Return sku -> price, recomputed only when the ledger has changed.
+    Pass get_potion_stock() rows if the caller already has them.
+    """
+    ledger_version = repo.ledger_version()
+    prices = plan_cache.get("prices", ledger_version)
+    if prices is None:
+        if potions is None:
+            potions = repo.get_potion_stock()
+        prices = compute_prices(potions, repo.get_recent_activity(ACTIVITY_WINDOW))
+        plan_cache.put("prices", ledger_version, prices)
+    return prices
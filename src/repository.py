@@ -0,0 +1,825 @@
+import os
+from abc import ABC, abstractmethod
+import threading
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+from src.ledger import LEDGER_COLUMNS, LEDGER_DELTA_COLUMNS, LedgerWriter
+
+# seed potion types from schema.sql as (sku, name, red, green, blue, dark, price)
+DEFAULT_POTION_TYPES = [
+    ("GREEN_POTION_0", "Green Potion", 0, 100, 0, 0, 50),
+    ("RED_POTION_0", "Red Potion", 100, 0, 0, 0, 50),
+    ("BLUE_POTION_0", "Blue Potion", 0, 0, 100, 0, 50),
+    ("DARK_POTION_0", "Dark Potion", 0, 0, 0, 100, 50),
+    ("TURQUOISE_POTION_0", "Turquoise Potion", 0, 50, 50, 0, 5),
+    ("RAINBOW_POTION_0", "Rainbow Potion", 25, 25, 25, 25, 5),
+]
+
+
+def normalize_ledger_entry(entry: dict) -> dict:
+    """
+    Fill in defaults for any ledger column missing from the entry.
+    """
+    row = {column: 0 for column in LEDGER_DELTA_COLUMNS}
+    row["potion_type_id"] = None
+    row["order_id"] = None
+    row.update(entry)
+    return row
+
+
+class Repository(ABC):
+    """
+    Storage interface used by the routers. Every method must be called on
+    the repository yielded by begin(), which scopes one transaction. A
+    backend missing any abstract method fails when it is constructed.
+
+    Balances are returned as a dict with the keys num_red_ml, num_green_ml,
+    num_blue_ml, num_dark_ml, gold and potions. Potion rows are tuples of
+    (id, sku, name, price, red, green, blue, dark) with the stock appended
+    as a ninth element by get_potion_stock.
+    """
+
+    @abstractmethod
+    @contextmanager
+    def begin(self):
+        ...
+
+    # ledger
+    @abstractmethod
+    def append_ledger(self, entries: list[dict]) -> None:
+        ...
+
+    @abstractmethod
+    def get_balances(self) -> dict:
+        ...
+
+    @abstractmethod
+    def ledger_version(self) -> int:
+        ...
+
+    @abstractmethod
+    def get_recent_activity(self, window: int) -> dict:
+        """
+        Summarize the newest window ledger rows as {"sales": {potion_type_id:
+        potions sold}, "barrel_gold": gold spent on barrels, "barrel_ml": ml
+        delivered in barrels}.
+        """
+        ...
+
+    # potions
+    @abstractmethod
+    def get_potion_types(self) -> list[tuple]:
+        ...
+
+    @abstractmethod
+    def get_potion_stock(self) -> list[tuple]:
+        ...
+
+    @abstractmethod
+    def find_potion_type_id(self, potion_type: list[int]) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def get_potion_by_sku(self, sku: str) -> Optional[tuple]:
+        ...
+
+    # carts
+    @abstractmethod
+    def create_cart(self, customer_name: str) -> int:
+        ...
+
+    @abstractmethod
+    def get_cart_customer(self, cart_id: int) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def add_cart_item(self, cart_id: int, potion_type_id: int, quantity: int, price: int) -> None:
+        """
+        Add to the cart's line item for this potion at this price, or start a
+        new line item. A potion quoted at a different price than before gets
+        its own line, so checkout charges each quantity what it was quoted.
+        """
+        ...
+
+    @abstractmethod
+    def get_cart_items(self, cart_id: int) -> list[tuple]:
+        ...
+
+    @abstractmethod
+    def delete_cart(self, cart_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def delete_all_carts(self) -> None:
+        ...
+
+    @abstractmethod
+    def search_cart_items(
+        self, customer_name: str, potion_sku: str, sort_col: str, sort_order: str, limit: int, offset: int
+    ) -> list[tuple]:
+        ...
+
+    # game clock
+    @abstractmethod
+    def record_game_time(self, day: str, hour: int) -> None:
+        ...
+
+    @abstractmethod
+    def get_game_time(self) -> Optional[tuple]:
+        ...
+
+    @abstractmethod
+    def count_game_ticks(self, day: str = "") -> int:
+        """
+        Number of clock ticks recorded, optionally only those on the given
+        game day (case-insensitive).
+        """
+        ...
+
+    # sales analytics
+    @abstractmethod
+    def refresh_sales_rollups(self) -> None:
+        ...
+
+    @abstractmethod
+    def get_sales_rollups(self) -> list[tuple]:
+        """
+        Return every rollup row as (potion_type_id, sku, day, hour, quantity, gold).
+        """
+        ...
+
+    # batched carts; the defaults fall back to the single-row methods
+    def create_carts(self, customer_names: list[str]) -> list[int]:
+        return [self.create_cart(customer_name) for customer_name in customer_names]
+
+    def get_existing_cart_ids(self, cart_ids: list[int]) -> set[int]:
+        return {cart_id for cart_id in cart_ids if self.get_cart_customer(cart_id) is not None}
+
+    def get_potions_by_skus(self, skus: list[str]) -> dict:
+        potions = {sku: self.get_potion_by_sku(sku) for sku in skus}
+        return {sku: potion for sku, potion in potions.items() if potion}
+
+    def add_cart_items(self, items: list[tuple]) -> None:
+        for cart_id, potion_type_id, quantity, price in items:
+            self.add_cart_item(cart_id, potion_type_id, quantity, price)
+
+    def checkout_carts(self, cart_ids: list[int]) -> dict:
+        """
+        Check out every given cart that has items, recording the purchases in
+        the ledger and deleting the carts. Returns cart_id -> (potions, gold).
+        """
+        totals = {}
+        writer = LedgerWriter()
+        for cart_id in cart_ids:
+            cart_items = self.get_cart_items(cart_id)
+            if not cart_items:
+                continue
+            for potion_type_id, quantity, price, _ in cart_items:
+                writer.add(
+                    "purchase",
+                    potion_type_id,
+                    order_id=cart_id,
+                    potion_quantity_change=-quantity,
+                    gold_change=price * quantity,
+                )
+            totals[cart_id] = (
+                sum(item[1] for item in cart_items),
+                sum(item[1] * item[2] for item in cart_items),
+            )
+        writer.flush(self)
+        for cart_id in totals:
+            self.delete_cart(cart_id)
+        return totals
+
+
+class PostgresRepository(Repository):
+    """
+    Repository backed by the Postgres tables in schema.sql.
+    """
+
+    def __init__(self, connection=None):
+        self._connection = connection
+
+    @contextmanager
+    def begin(self):
+        from src import database as db
+
+        with db.get_engine().begin() as connection:
+            yield PostgresRepository(connection)
+
+    def _execute(self, query: str, params=None):
+        # imported here to keep sqlalchemy off the cold start path
+        import sqlalchemy
+
+        return self._connection.execute(sqlalchemy.text(query), params or {})
+
+    def append_ledger(self, entries: list[dict]) -> None:
+        if not entries:
+            return
+        # lock the version row first; concurrent writers wait here until
+        # this transaction commits, so versions follow commit order
+        self._execute("UPDATE ledger_version SET version = version + 1")
+
+        # one INSERT of array parameters, the same SQL whatever the batch size
+        rows = [normalize_ledger_entry(entry) for entry in entries]
+        self._execute(
+            """
+            INSERT INTO inventory_ledger (
+                transaction_type, potion_type_id, order_id, num_red_ml_change, num_blue_ml_change,
+                num_green_ml_change, num_dark_ml_change, gold_change, potion_quantity_change
+            )
+            SELECT * FROM unnest(
+                CAST(:transaction_type AS varchar[]), CAST(:potion_type_id AS int[]),
+                CAST(:order_id AS int[]), CAST(:num_red_ml_change AS int[]),
+                CAST(:num_blue_ml_change AS int[]), CAST(:num_green_ml_change AS int[]),
+                CAST(:num_dark_ml_change AS int[]), CAST(:gold_change AS int[]),
+                CAST(:potion_quantity_change AS int[])
+            )
+            """,
+            {column: [row[column] for row in rows] for column in LEDGER_COLUMNS},
+        )
+
+    def get_balances(self) -> dict:
+        row = self._execute("""
+            SELECT
+                COALESCE(SUM(num_red_ml_change), 0),
+                COALESCE(SUM(num_green_ml_change), 0),
+                COALESCE(SUM(num_blue_ml_change), 0),
+                COALESCE(SUM(num_dark_ml_change), 0),
+                COALESCE(SUM(gold_change), 0),
+                COALESCE(SUM(potion_quantity_change), 0)
+            FROM inventory_ledger
+        """).fetchone()
+        return {
+            "num_red_ml": row[0],
+            "num_green_ml": row[1],
+            "num_blue_ml": row[2],
+            "num_dark_ml": row[3],
+            "gold": row[4],
+            "potions": row[5],
+        }
+
+    def ledger_version(self) -> int:
+        # MAX(id) can stand still when a lower id commits late, so count
+        # writes in a row that append_ledger bumps in the same transaction
+        return self._execute("SELECT version FROM ledger_version").scalar()
+
+    def get_recent_activity(self, window: int) -> dict:
+        activity = {"sales": {}, "barrel_gold": 0, "barrel_ml": 0}
+        result = self._execute(
+            """
+            SELECT transaction_type, potion_type_id,
+                   SUM(-potion_quantity_change), SUM(-gold_change),
+                   SUM(num_red_ml_change + num_green_ml_change + num_blue_ml_change + num_dark_ml_change)
+            FROM inventory_ledger
+            WHERE id > (SELECT COALESCE(MAX(id), 0) FROM inventory_ledger) - :window
+            AND transaction_type IN ('purchase', 'barrel delivery')
+            GROUP BY transaction_type, potion_type_id
+            """,
+            {"window": window},
+        )
+        for transaction_type, potion_type_id, potions_sold, gold_spent, ml in result:
+            if transaction_type == "purchase":
+                activity["sales"][potion_type_id] = potions_sold
+            else:
+                activity["barrel_gold"] += gold_spent
+                activity["barrel_ml"] += ml
+        return activity
+
+    def get_potion_types(self) -> list[tuple]:
+        return [
+            tuple(row)
+            for row in self._execute("""
+                SELECT id, sku, name, price, red, green, blue, dark
+                FROM potion_types
+                ORDER BY id
+            """)
+        ]
+
+    def get_potion_stock(self) -> list[tuple]:
+        return [
+            tuple(row)
+            for row in self._execute("""
+                SELECT pt.id, pt.sku, pt.name, pt.price, pt.red, pt.green, pt.blue, pt.dark,
+                       COALESCE(SUM(il.potion_quantity_change), 0) AS quantity
+                FROM potion_types pt
+                LEFT JOIN inventory_ledger il ON pt.id = il.potion_type_id
+                GROUP BY pt.id, pt.sku, pt.name, pt.price, pt.red, pt.green, pt.blue, pt.dark
+                ORDER BY pt.id
+            """)
+        ]
+
+    def find_potion_type_id(self, potion_type: list[int]) -> Optional[int]:
+        red, green, blue, dark = potion_type
+        return self._execute(
+            """
+            SELECT id FROM potion_types
+            WHERE red = :red AND green = :green AND blue = :blue AND dark = :dark
+            """,
+            {"red": red, "green": green, "blue": blue, "dark": dark},
+        ).scalar()
+
+    def get_potion_by_sku(self, sku: str) -> Optional[tuple]:
+        row = self._execute(
+            "SELECT id, price FROM potion_types WHERE sku = :item_sku", {"item_sku": sku}
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def create_cart(self, customer_name: str) -> int:
+        return self._execute(
+            """
+            INSERT INTO carts (customer_name)
+            VALUES (:customer_name)
+            RETURNING id
+            """,
+            {"customer_name": customer_name},
+        ).scalar()
+
+    def get_cart_customer(self, cart_id: int) -> Optional[str]:
+        return self._execute(
+            "SELECT customer_name FROM carts WHERE id = :cart_id", {"cart_id": cart_id}
+        ).scalar()
+
+    def add_cart_item(self, cart_id: int, potion_type_id: int, quantity: int, price: int) -> None:
+        params = {
+            "cart_id": cart_id,
+            "potion_type_id": potion_type_id,
+            "quantity": quantity,
+            "price": price,
+        }
+        # add to the line item quoted at the same price if there is one, otherwise insert it
+        updated = self._execute(
+            """
+            UPDATE cart_items
+            SET quantity = quantity + :quantity
+            WHERE cart_id = :cart_id AND potion_type_id = :potion_type_id AND price = :price
+            """,
+            params,
+        )
+        if updated.rowcount == 0:
+            self._execute(
+                """
+                INSERT INTO cart_items (cart_id, potion_type_id, quantity, price)
+                VALUES (:cart_id, :potion_type_id, :quantity, :price)
+                """,
+                params,
+            )
+
+    def get_cart_items(self, cart_id: int) -> list[tuple]:
+        return [
+            tuple(row)
+            for row in self._execute(
+                """
+                SELECT ci.potion_type_id, ci.quantity, ci.price, pt.sku
+                FROM cart_items ci
+                JOIN potion_types pt ON ci.potion_type_id = pt.id
+                WHERE ci.cart_id = :cart_id
+                """,
+                {"cart_id": cart_id},
+            )
+        ]
+
+    def delete_cart(self, cart_id: int) -> None:
+        self._execute("""
+            DELETE FROM cart_items WHERE cart_id = :cart_id;
+            DELETE FROM carts WHERE id = :cart_id;
+        """, {"cart_id": cart_id})
+
+    def delete_all_carts(self) -> None:
+        self._execute("DELETE FROM cart_items")
+        self._execute("DELETE FROM carts")
+
+    def search_cart_items(
+        self, customer_name: str, potion_sku: str, sort_col: str, sort_order: str, limit: int, offset: int
+    ) -> list[tuple]:
+        result = self._execute(
+            """
+            SELECT potion_types.sku, carts.customer_name, cart_items.quantity, to_char(carts.created_at::timestamp, 'MM/DD/YYYY, HH12:MI:SS PM') as created_at
+            FROM carts
+            JOIN cart_items ON carts.id = cart_items.cart_id
+            JOIN potion_types ON potion_types.id = cart_items.potion_type_id
+            WHERE carts.customer_name ILIKE :customer_name
+            AND potion_types.sku ILIKE :potion_sku
+            ORDER BY
+                CASE WHEN :sort_col = 'customer_name' AND :sort_order = 'asc' THEN carts.customer_name END ASC,
+                CASE WHEN :sort_col = 'customer_name' AND :sort_order = 'desc' THEN carts.customer_name END DESC,
+                CASE WHEN :sort_col = 'item_sku' AND :sort_order = 'asc' THEN potion_types.sku END ASC,
+                CASE WHEN :sort_col = 'item_sku' AND :sort_order = 'desc' THEN potion_types.sku END DESC,
+                CASE WHEN :sort_col = 'line_item_total' AND :sort_order = 'asc' THEN cart_items.quantity END ASC,
+                CASE WHEN :sort_col = 'line_item_total' AND :sort_order = 'desc' THEN cart_items.quantity END DESC,
+                CASE WHEN :sort_col = 'timestamp' AND :sort_order = 'asc' THEN carts.created_at END ASC,
+                CASE WHEN :sort_col = 'timestamp' AND :sort_order = 'desc' THEN carts.created_at END DESC
+            LIMIT :limit OFFSET :offset
+            """,
+            {
+                "customer_name": f"%{customer_name}%",
+                "potion_sku": f"%{potion_sku}%",
+                "sort_col": sort_col,
+                "sort_order": sort_order,
+                "limit": limit,
+                "offset": offset,
+            },
+        )
+        return [tuple(row) for row in result]
+
+    def record_game_time(self, day: str, hour: int) -> None:
+        self._execute(
+            "INSERT INTO game_clock (day, hour) VALUES (:day, :hour)", {"day": day, "hour": hour}
+        )
+
+    def get_game_time(self) -> Optional[tuple]:
+        row = self._execute("SELECT day, hour FROM game_clock ORDER BY id DESC LIMIT 1").fetchone()
+        return tuple(row) if row else None
+
+    def count_game_ticks(self, day: str = "") -> int:
+        return self._execute(
+            "SELECT COUNT(*) FROM game_clock WHERE :day = '' OR LOWER(day) = LOWER(:day)", {"day": day}
+        ).scalar()
+
+    def refresh_sales_rollups(self) -> None:
+        # lock the high-water mark so concurrent refreshes don't double count
+        watermark = self._execute(
+            "SELECT last_ledger_id FROM rollup_watermarks WHERE name = 'sales' FOR UPDATE"
+        ).scalar() or 0
+        # MAX(id) over committed rows is a safe point only because append_ledger
+        # takes the ledger_version row lock before its INSERT and holds it to
+        # commit: ids are handed out in commit order, so no row still in flight
+        # can have an id below one that is already visible here
+        high_water = self._execute(
+            "SELECT COALESCE(MAX(id), :watermark) FROM inventory_ledger WHERE id > :watermark",
+            {"watermark": watermark},
+        ).scalar()
+        if high_water == watermark:
+            return
+
+        # fold purchases since the mark into the game hour they happened in
+        params = {"watermark": watermark, "high_water": high_water}
+        self._execute(
+            """
+            INSERT INTO sales_rollups (potion_type_id, day, hour, quantity, gold)
+            SELECT il.potion_type_id, COALESCE(gc.day, 'unknown'), COALESCE(gc.hour, -1),
+                   SUM(-il.potion_quantity_change), SUM(il.gold_change)
+            FROM inventory_ledger il
+            LEFT JOIN LATERAL (
+                SELECT day, hour FROM game_clock
+                WHERE created_at <= il.timestamp
+                ORDER BY created_at DESC
+                LIMIT 1
+            ) gc ON TRUE
+            WHERE il.id > :watermark AND il.id <= :high_water
+            AND il.transaction_type = 'purchase'
+            GROUP BY il.potion_type_id, COALESCE(gc.day, 'unknown'), COALESCE(gc.hour, -1)
+            ON CONFLICT (potion_type_id, day, hour) DO UPDATE
+            SET quantity = sales_rollups.quantity + EXCLUDED.quantity,
+                gold = sales_rollups.gold + EXCLUDED.gold
+            """,
+            params,
+        )
+        self._execute(
+            "UPDATE rollup_watermarks SET last_ledger_id = :high_water WHERE name = 'sales'", params
+        )
+
+    def get_sales_rollups(self) -> list[tuple]:
+        return [
+            tuple(row)
+            for row in self._execute("""
+                SELECT sr.potion_type_id, pt.sku, sr.day, sr.hour, sr.quantity, sr.gold
+                FROM sales_rollups sr
+                JOIN potion_types pt ON pt.id = sr.potion_type_id
+            """)
+        ]
+
+    def create_carts(self, customer_names: list[str]) -> list[int]:
+        if not customer_names:
+            return []
+        result = self._execute(
+            """
+            INSERT INTO carts (customer_name)
+            SELECT customer_name
+            FROM unnest(CAST(:customer_names AS text[])) WITH ORDINALITY AS t(customer_name, n)
+            ORDER BY n
+            RETURNING id
+            """,
+            {"customer_names": list(customer_names)},
+        )
+        # ids come from a sequence, so sorting them restores insert order
+        return sorted(row[0] for row in result)
+
+    def get_existing_cart_ids(self, cart_ids: list[int]) -> set[int]:
+        if not cart_ids:
+            return set()
+        result = self._execute(
+            "SELECT id FROM carts WHERE id = ANY(:cart_ids)", {"cart_ids": list(cart_ids)}
+        )
+        return {row[0] for row in result}
+
+    def get_potions_by_skus(self, skus: list[str]) -> dict:
+        if not skus:
+            return {}
+        result = self._execute(
+            "SELECT sku, id, price FROM potion_types WHERE sku = ANY(:skus)", {"skus": list(skus)}
+        )
+        return {row[0]: (row[1], row[2]) for row in result}
+
+    def add_cart_items(self, items: list[tuple]) -> None:
+        if not items:
+            return
+        # merge repeated (cart, potion, price) lines so each line item is touched once
+        merged = {}
+        for cart_id, potion_type_id, quantity, price in items:
+            key = (cart_id, potion_type_id, price)
+            merged[key] = merged.get(key, 0) + quantity
+
+        params = {
+            "cart_ids": [key[0] for key in merged],
+            "potion_type_ids": [key[1] for key in merged],
+            "quantities": list(merged.values()),
+            "prices": [key[2] for key in merged],
+        }
+        new_items = """
+            unnest(
+                CAST(:cart_ids AS int[]), CAST(:potion_type_ids AS int[]),
+                CAST(:quantities AS int[]), CAST(:prices AS int[])
+            ) AS v(cart_id, potion_type_id, quantity, price)
+        """
+        self._execute(f"""
+            UPDATE cart_items ci
+            SET quantity = ci.quantity + v.quantity
+            FROM {new_items}
+            WHERE ci.cart_id = v.cart_id AND ci.potion_type_id = v.potion_type_id AND ci.price = v.price
+        """, params)
+        self._execute(f"""
+            INSERT INTO cart_items (cart_id, potion_type_id, quantity, price)
+            SELECT v.cart_id, v.potion_type_id, v.quantity, v.price
+            FROM {new_items}
+            WHERE NOT EXISTS (
+                SELECT 1 FROM cart_items ci
+                WHERE ci.cart_id = v.cart_id AND ci.potion_type_id = v.potion_type_id AND ci.price = v.price
+            )
+        """, params)
+
+    def checkout_carts(self, cart_ids: list[int]) -> dict:
+        if not cart_ids:
+            return {}
+        totals = {}
+        writer = LedgerWriter()
+        for cart_id, potion_type_id, quantity, price in self._execute(
+            """
+            SELECT cart_id, potion_type_id, quantity, price
+            FROM cart_items
+            WHERE cart_id = ANY(:cart_ids)
+            """,
+            {"cart_ids": list(cart_ids)},
+        ):
+            writer.add(
+                "purchase",
+                potion_type_id,
+                order_id=cart_id,
+                potion_quantity_change=-quantity,
+                gold_change=price * quantity,
+            )
+            potions, gold = totals.get(cart_id, (0, 0))
+            totals[cart_id] = (potions + quantity, gold + price * quantity)
+        if not totals:
+            return {}
+
+        # only carts with items are checked out, like the single-cart endpoint
+        writer.flush(self)
+        params = {"cart_ids": list(totals)}
+        self._execute("""
+            DELETE FROM cart_items WHERE cart_id = ANY(:cart_ids);
+            DELETE FROM carts WHERE id = ANY(:cart_ids);
+        """, params)
+        return totals
+
+
+class InMemoryRepository(Repository):
+    """
+    Repository that keeps the ledger in process as compact columnar arrays,
+    one int64 array per ledger column, alongside running totals for the
+    balances and per-potion stock. Reads never scan the ledger, which makes
+    it suitable for unit tests, benchmarks and the offline simulator.
+
+    Transactions are serialized with a lock but are not rolled back on error.
+    """
+
+    _BALANCE_KEYS = ["num_red_ml", "num_blue_ml", "num_green_ml", "num_dark_ml", "gold", "potions"]
+
+    def __init__(self, potion_types: list[tuple] = DEFAULT_POTION_TYPES):
+        self._lock = threading.RLock()
+
+        # potion types as (id, sku, name, price, red, green, blue, dark)
+        self._potion_types = [
+            (i + 1, sku, name, price, red, green, blue, dark)
+            for i, (sku, name, red, green, blue, dark, price) in enumerate(potion_types)
+        ]
+        self._potion_index = {potion[0]: i for i, potion in enumerate(self._potion_types)}
+        self._potion_by_sku = {potion[1]: potion for potion in self._potion_types}
+        self._potion_by_mix = {tuple(potion[4:8]): potion[0] for potion in self._potion_types}
+
+        # ledger columns; potion_type_id and order_id 0 stand in for NULL
+        self._transaction_types = []
+        self._transaction_type_codes = {}
+        self.ledger = {column: array("q") for column in LEDGER_COLUMNS}
+        self.ledger["transaction_type"] = array("B")
+
+        # running totals kept in step with every append
+        self._totals = array("q", [0] * len(self._BALANCE_KEYS))
+        self._stock = array("q", [0] * len(self._potion_types))
+
+        self._carts = {}
+        self._next_cart_id = 1
+
+        # every clock tick seen, as (day, hour), and the tick each ledger row was written in
+        self._game_clock = []
+        self._ledger_ticks = array("l")
+
+        # sales rollups as (potion_type_id, day, hour) -> [quantity, gold]
+        self._sales_rollups = {}
+        self._rollup_watermark = 0
+
+    @contextmanager
+    def begin(self):
+        with self._lock:
+            yield self
+
+    def _transaction_type_code(self, transaction_type: str) -> int:
+        code = self._transaction_type_codes.get(transaction_type)
+        if code is None:
+            code = len(self._transaction_types)
+            self._transaction_types.append(transaction_type)
+            self._transaction_type_codes[transaction_type] = code
+        return code
+
+    def append_ledger(self, entries: list[dict]) -> None:
+        ledger = self.ledger
+        totals = self._totals
+        for entry in entries:
+            row = normalize_ledger_entry(entry)
+            potion_type_id = row["potion_type_id"] or 0
+            if potion_type_id and potion_type_id not in self._potion_index:
+                raise ValueError(f"Invalid potion type id: {potion_type_id}")
+
+            ledger["transaction_type"].append(self._transaction_type_code(row["transaction_type"]))
+            ledger["potion_type_id"].append(potion_type_id)
+            ledger["order_id"].append(row["order_id"] or 0)
+            self._ledger_ticks.append(len(self._game_clock) - 1)
+            for column in LEDGER_DELTA_COLUMNS:
+                ledger[column].append(row[column])
+
+            totals[0] += row["num_red_ml_change"]
+            totals[1] += row["num_blue_ml_change"]
+            totals[2] += row["num_green_ml_change"]
+            totals[3] += row["num_dark_ml_change"]
+            totals[4] += row["gold_change"]
+            # counted even without a potion type, as the Postgres SUM does
+            totals[5] += row["potion_quantity_change"]
+            if potion_type_id:
+                self._stock[self._potion_index[potion_type_id]] += row["potion_quantity_change"]
+
+    def get_balances(self) -> dict:
+        return dict(zip(self._BALANCE_KEYS, self._totals))
+
+    def ledger_version(self) -> int:
+        return len(self.ledger["potion_type_id"])
+
+    def get_recent_activity(self, window: int) -> dict:
+        activity = {"sales": {}, "barrel_gold": 0, "barrel_ml": 0}
+        purchase = self._transaction_type_codes.get("purchase")
+        barrel_delivery = self._transaction_type_codes.get("barrel delivery")
+        ledger = self.ledger
+        for i in range(max(self.ledger_version() - window, 0), self.ledger_version()):
+            transaction_type = ledger["transaction_type"][i]
+            if transaction_type == purchase:
+                potion_type_id = ledger["potion_type_id"][i]
+                activity["sales"][potion_type_id] = (
+                    activity["sales"].get(potion_type_id, 0) - ledger["potion_quantity_change"][i]
+                )
+            elif transaction_type == barrel_delivery:
+                activity["barrel_gold"] -= ledger["gold_change"][i]
+                activity["barrel_ml"] += (
+                    ledger["num_red_ml_change"][i] + ledger["num_green_ml_change"][i]
+                    + ledger["num_blue_ml_change"][i] + ledger["num_dark_ml_change"][i]
+                )
+        return activity
+
+    def get_potion_types(self) -> list[tuple]:
+        return list(self._potion_types)
+
+    def get_potion_stock(self) -> list[tuple]:
+        return [potion + (stock,) for potion, stock in zip(self._potion_types, self._stock)]
+
+    def find_potion_type_id(self, potion_type: list[int]) -> Optional[int]:
+        return self._potion_by_mix.get(tuple(potion_type))
+
+    def get_potion_by_sku(self, sku: str) -> Optional[tuple]:
+        potion = self._potion_by_sku.get(sku)
+        return (potion[0], potion[3]) if potion else None
+
+    def record_game_time(self, day: str, hour: int) -> None:
+        self._game_clock.append((day, hour))
+
+    def get_game_time(self) -> Optional[tuple]:
+        return self._game_clock[-1] if self._game_clock else None
+
+    def count_game_ticks(self, day: str = "") -> int:
+        if not day:
+            return len(self._game_clock)
+        return sum(1 for tick_day, _ in self._game_clock if tick_day.lower() == day.lower())
+
+    def refresh_sales_rollups(self) -> None:
+        purchase = self._transaction_type_codes.get("purchase")
+        ledger = self.ledger
+        high_water = self.ledger_version()
+        for i in range(self._rollup_watermark, high_water):
+            if ledger["transaction_type"][i] != purchase:
+                continue
+            tick = self._ledger_ticks[i]
+            day, hour = self._game_clock[tick] if tick >= 0 else ("unknown", -1)
+            rollup = self._sales_rollups.setdefault((ledger["potion_type_id"][i], day, hour), [0, 0])
+            rollup[0] -= ledger["potion_quantity_change"][i]
+            rollup[1] += ledger["gold_change"][i]
+        self._rollup_watermark = high_water
+
+    def get_sales_rollups(self) -> list[tuple]:
+        return [
+            (potion_type_id, self._potion_types[self._potion_index[potion_type_id]][1], day, hour, quantity, gold)
+            for (potion_type_id, day, hour), (quantity, gold) in self._sales_rollups.items()
+        ]
+
+    def create_cart(self, customer_name: str) -> int:
+        cart_id = self._next_cart_id
+        self._next_cart_id += 1
+        # each cart keeps its line items as (potion_type_id, price) -> quantity
+        self._carts[cart_id] = (customer_name, datetime.now(), {})
+        return cart_id
+
+    def get_cart_customer(self, cart_id: int) -> Optional[str]:
+        cart = self._carts.get(cart_id)
+        return cart[0] if cart else None
+
+    def add_cart_item(self, cart_id: int, potion_type_id: int, quantity: int, price: int) -> None:
+        items = self._carts[cart_id][2]
+        key = (potion_type_id, price)
+        items[key] = items.get(key, 0) + quantity
+
+    def get_cart_items(self, cart_id: int) -> list[tuple]:
+        cart = self._carts.get(cart_id)
+        if not cart:
+            return []
+        return [
+            (potion_type_id, quantity, price, self._potion_types[self._potion_index[potion_type_id]][1])
+            for (potion_type_id, price), quantity in cart[2].items()
+        ]
+
+    def delete_cart(self, cart_id: int) -> None:
+        self._carts.pop(cart_id, None)
+
+    def delete_all_carts(self) -> None:
+        self._carts.clear()
+
+    def search_cart_items(
+        self, customer_name: str, potion_sku: str, sort_col: str, sort_order: str, limit: int, offset: int
+    ) -> list[tuple]:
+        customer_name = customer_name.lower()
+        potion_sku = potion_sku.lower()
+        rows = []
+        for name, created_at, items in self._carts.values():
+            if customer_name not in name.lower():
+                continue
+            for (potion_type_id, _), quantity in items.items():
+                sku = self._potion_types[self._potion_index[potion_type_id]][1]
+                if potion_sku in sku.lower():
+                    rows.append((sku, name, quantity, created_at))
+
+        sort_index = {"item_sku": 0, "customer_name": 1, "line_item_total": 2, "timestamp": 3}[sort_col]
+        rows.sort(key=lambda row: row[sort_index], reverse=sort_order == "desc")
+        return [
+            (sku, name, quantity, created_at.strftime("%m/%d/%Y, %I:%M:%S %p"))
+            for sku, name, quantity, created_at in rows[offset:offset + limit]
+        ]
+
+
+_repository = None
+
+
+def get_repository() -> Repository:
+    """
+    Return the active repository, creating it on first use. Set
+    STORAGE_BACKEND=memory to run without Postgres.
+    """
+    global _repository
+    if _repository is None:
+        if os.environ.get("STORAGE_BACKEND", "postgres") == "memory":
+            _repository = InMemoryRepository()
+        else:
+            _repository = PostgresRepository()
+    return _repository
+
+
+def set_repository(repository: Repository) -> None:
+    global _repository
+    _repository = repository
@@ -0,0 +1,322 @@
+"""
+Offline game-day simulator.
+
+Drives the real barrel and bottle planners, the deliver endpoints and the
+cart endpoints against an InMemoryRepository, so planner changes can be
+evaluated over simulated weeks instead of one live tick at a time.
+
+    python -m src.simulator --days 70 --seeds 16 --workers 4
+    python -m src.simulator --barrel-planner mymodule:my_plan
+
+A barrel planner takes the wholesale catalog and returns (sku, quantity)
+rows; a bottle planner takes no arguments and returns (potion_type,
+quantity) rows.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from fastapi import BackgroundTasks
+
+from src import plan_cache
+from src.api import admin, barrels, bottler, carts, catalog, info
+from src.repository import InMemoryRepository, set_repository
+from src.util import GAME_DAYS
+
+HOURS = list(range(0, 24, 2))
+
+ML_CAPACITY = 10000
+POTION_CAPACITY = 50
+
+# ml balance keys in [r, g, b, d] order
+ML_KEYS = ["num_red_ml", "num_green_ml", "num_blue_ml", "num_dark_ml"]
+
+# preferred potion mix [r, g, b, d] for each customer class
+CUSTOMER_CLASSES = {
+    "Warrior": [100, 0, 0, 0],
+    "Druid": [0, 100, 0, 0],
+    "Wizard": [0, 0, 100, 0],
+    "Necromancer": [0, 0, 0, 100],
+    "Ranger": [0, 50, 50, 0],
+    "Bard": [25, 25, 25, 25],
+    "Paladin": [50, 0, 50, 0],
+}
+
+# expected number of customers per tick by hour of day
+ARRIVAL_RATES = {
+    0: 0.5, 2: 0.3, 4: 0.3, 6: 1.0, 8: 2.0, 10: 3.0,
+    12: 3.5, 14: 3.0, 16: 2.5, 18: 3.0, 20: 2.0, 22: 1.0,
+}
+
+# wholesale barrels as (sku, ml_per_barrel, potion_type, base price)
+WHOLESALE_BARRELS = [
+    ("SMALL_RED_BARREL", 500, [1, 0, 0, 0], 100),
+    ("SMALL_GREEN_BARREL", 500, [0, 1, 0, 0], 100),
+    ("SMALL_BLUE_BARREL", 500, [0, 0, 1, 0], 120),
+    ("MEDIUM_RED_BARREL", 2500, [1, 0, 0, 0], 250),
+    ("MEDIUM_GREEN_BARREL", 2500, [0, 1, 0, 0], 250),
+    ("MEDIUM_BLUE_BARREL", 2500, [0, 0, 1, 0], 300),
+    ("LARGE_RED_BARREL", 10000, [1, 0, 0, 0], 500),
+    ("LARGE_GREEN_BARREL", 10000, [0, 1, 0, 0], 400),
+    ("LARGE_BLUE_BARREL", 10000, [0, 0, 1, 0], 600),
+    ("LARGE_DARK_BARREL", 10000, [0, 0, 0, 1], 750),
+]
+
+
+def load_planner(path: str):
+    """
+    Resolve a planner given as "module:function".
+    """
+    module_name, function_name = path.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def poisson(rng: random.Random, rate: float) -> int:
+    # Knuth's method, fine for the small per-tick rates used here
+    limit = math.exp(-rate)
+    count = 0
+    product_ = rng.random()
+    while product_ > limit:
+        count += 1
+        product_ *= rng.random()
+    return count
+
+
+def wholesale_catalog(rng: random.Random) -> list[barrels.Barrel]:
+    catalog_ = []
+    for sku, ml_per_barrel, potion_type, price in WHOLESALE_BARRELS:
+        if rng.random() < 0.7:
+            # the simulator's own data is trusted, so skip validation
+            catalog_.append(barrels.Barrel.construct(
+                sku=sku,
+                ml_per_barrel=ml_per_barrel,
+                potion_type=potion_type,
+                price=round(price * (0.9 + 0.2 * rng.random())),
+                quantity=1 + int(10 * rng.random()),
+            ))
+    return catalog_
+
+
+def mix_distance(potion_type: list[int], preference: list[int]) -> int:
+    # 0 for the preferred mix, 100 or more for one the customer won't buy at any price
+    return sum(abs(a - b) for a, b in zip(potion_type, preference))
+
+
+def choose_item(items: list, preference: list[int], wealth: int):
+    """
+    Pick the catalog item the customer likes best, or None if nothing in
+    stock is both close enough to their preference and affordable. Items
+    are [sku, name, quantity, price, potion_type] rows.
+    """
+    best, best_value = None, 0.0
+    for item in items:
+        _, _, quantity, price, potion_type = item
+        # willingness to pay falls off with distance from the preferred mix
+        max_price = wealth * (1 - mix_distance(potion_type, preference) / 100)
+        if quantity > 0 and price <= max_price:
+            value = max_price - price
+            if best is None or value > best_value:
+                best, best_value = item, value
+    return best
+
+
+def has_wanted_stock(items: list, preference: list[int]) -> bool:
+    """
+    Whether any item in stock is close enough to the preference that the
+    customer would buy it at some price.
+    """
+    return any(item[2] > 0 and mix_distance(item[4], preference) < 100 for item in items)
+
+
+def run_simulation(
+    seed: int,
+    days: int,
+    barrel_planner: str = "src.api.barrels:wholesale_purchase_plan",
+    bottle_planner: str = "src.api.bottler:bottle_plan",
+) -> dict:
+    """
+    Simulate the given number of game days and return a report of the
+    shop's gold, sales, customers turned away and ml left over.
+
+    Customers who find nothing they want in stock count as stockouts, those
+    who want something in stock but can't afford it as priced out. ml_unused
+    is what is still in barrels at the end of the run and ml_lost is ml paid
+    for that was neither bottled nor is still on hand.
+    """
+    rng = random.Random(seed)
+    plan_barrels = load_planner(barrel_planner)
+    plan_bottles = load_planner(bottle_planner)
+
+    repo = InMemoryRepository()
+    set_repository(repo)
+    # cached plans are keyed on ledger versions of the previous run's repository
+    plan_cache.clear()
+
+    report = {
+        "seed": seed,
+        "days": days,
+        "barrel_planner": barrel_planner,
+        "bottle_planner": bottle_planner,
+        "customers": 0,
+        "potions_sold": 0,
+        "revenue": 0,
+        "stockouts": 0,
+        "priced_out": 0,
+        "invalid_barrel_plans": 0,
+        "invalid_bottle_plans": 0,
+        "ml_bought": 0,
+        "ml_bottled": 0,
+    }
+    order_id = 0
+    started = time.perf_counter()
+
+    # the endpoints log every call, which would dominate the run time
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        admin.reset()
+
+        for day_index, tick in product(range(days), range(len(HOURS))):
+            # keep the captured log from growing for the whole run
+            log.seek(0)
+            log.truncate()
+
+            hour = HOURS[tick]
+            order_id += 1
+            # the precompute task is left unrun, the planners compute on demand
+            info.post_time(info.Timestamp(day=GAME_DAYS[day_index % len(GAME_DAYS)], hour=hour), BackgroundTasks())
+
+            if tick % 2 == 0:
+                # barrel purchasing
+                offered = wholesale_catalog(rng)
+                offered_by_sku = {barrel.sku: barrel for barrel in offered}
+                plan = plan_barrels(list(offered))
+
+                balances = repo.get_balances()
+                cost = 0
+                ml_bought = 0
+                delivered = []
+                for sku, quantity in plan:
+                    barrel = offered_by_sku.get(sku)
+                    if barrel is None or quantity > barrel.quantity:
+                        delivered = None
+                        break
+                    cost += barrel.price * quantity
+                    ml_bought += barrel.ml_per_barrel * quantity
+                    delivered.append(barrel.copy(update={"quantity": quantity}))
+
+                # the game rejects orders the shop can't pay for or store
+                total_ml = sum(balances[key] for key in ML_KEYS)
+                if delivered is None or cost > balances["gold"] or total_ml + ml_bought > ML_CAPACITY:
+                    report["invalid_barrel_plans"] += 1
+                elif delivered:
+                    barrels.post_deliver_barrels(delivered, order_id)
+                    report["ml_bought"] += ml_bought
+            else:
+                # bottling
+                plan = plan_bottles()
+                balances = repo.get_balances()
+                needed = [sum(potion_type[i] * quantity for potion_type, quantity in plan) for i in range(4)]
+                available = [balances[key] for key in ML_KEYS]
+                bottled = sum(quantity for _, quantity in plan)
+
+                if any(n > a for n, a in zip(needed, available)) or balances["potions"] + bottled > POTION_CAPACITY:
+                    report["invalid_bottle_plans"] += 1
+                elif plan:
+                    potions = [
+                        bottler.PotionInventory.construct(potion_type=potion_type, quantity=quantity)
+                        for potion_type, quantity in plan
+                    ]
+                    bottler.post_deliver_bottles(potions, order_id)
+                    report["ml_bottled"] += sum(needed)
+
+            # customers shop against one catalog snapshot per tick
+            arrivals = poisson(rng, ARRIVAL_RATES[hour])
+            if not arrivals:
+                continue
+            items = [list(row) for row in catalog.catalog_rows()]
+            for _ in range(arrivals):
+                character_class = rng.choice(list(CUSTOMER_CLASSES))
+                level = rng.randint(1, 20)
+                report["customers"] += 1
+
+                preference = CUSTOMER_CLASSES[character_class]
+                item = choose_item(items, preference, 20 + 10 * level)
+                if item is None:
+                    if has_wanted_stock(items, preference):
+                        report["priced_out"] += 1
+                    else:
+                        report["stockouts"] += 1
+                    continue
+
+                sku = item[0]
+                quantity = min(item[2], rng.randint(1, 3))
+                customer = carts.Customer(customer_name=f"customer_{order_id}", character_class=character_class, level=level)
+                cart_id = carts.create_cart(customer)["cart_id"]
+                carts.set_item_quantity(cart_id, sku, carts.CartItem(quantity=quantity))
+                result = carts.checkout(cart_id, carts.CartCheckout(payment="gold"))
+
+                item[2] -= quantity
+                report["potions_sold"] += result["total_potions_bought"]
+                report["revenue"] += result["total_gold_paid"]
+
+    balances = repo.get_balances()
+    elapsed = time.perf_counter() - started
+    report["gold"] = balances["gold"]
+    report["ml_unused"] = sum(balances[key] for key in ML_KEYS)
+    # should stay 0; anything else means the ledger lost track of ml
+    report["ml_lost"] = report["ml_bought"] - report["ml_bottled"] - report["ml_unused"]
+    report["days_per_second"] = round(days / elapsed) if elapsed else 0
+    return report
+
+
+def _run(args: tuple) -> dict:
+    return run_simulation(*args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate game days against the shop's planners.")
+    parser.add_argument("--days", type=int, default=70, help="game days per run")
+    parser.add_argument("--seeds", type=int, default=8, help="number of seeded runs per planner pair")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--barrel-planner", action="append", help="module:function, may be repeated")
+    parser.add_argument("--bottle-planner", action="append", help="module:function, may be repeated")
+    args = parser.parse_args()
+
+    barrel_planners = args.barrel_planner or ["src.api.barrels:wholesale_purchase_plan"]
+    bottle_planners = args.bottle_planner or ["src.api.bottler:bottle_plan"]
+    runs = [
+        (seed, args.days, barrel_planner, bottle_planner)
+        for barrel_planner, bottle_planner in product(barrel_planners, bottle_planners)
+        for seed in range(args.seeds)
+    ]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        reports = list(pool.map(_run, runs))
+    elapsed = time.perf_counter() - started
+
+    columns = ["seed", "gold", "revenue", "potions_sold", "customers", "stockouts", "priced_out",
+        "invalid_barrel_plans", "invalid_bottle_plans", "ml_unused", "ml_lost", "days_per_second"]
+    for barrel_planner, bottle_planner in product(barrel_planners, bottle_planners):
+        print(f"\n{barrel_planner} + {bottle_planner}")
+        print("  ".join(f"{column:>{len(column)}}" for column in columns))
+        group = [
+            report for report in reports
+            if report["barrel_planner"] == barrel_planner and report["bottle_planner"] == bottle_planner
+        ]
+        for report in group:
+            print("  ".join(f"{report[column]:>{len(column)}}" for column in columns))
+        means = {column: round(sum(report[column] for report in group) / len(group)) for column in columns[1:]}
+        print("  ".join(["mean"] + [f"{means[column]:>{len(column)}}" for column in columns[1:]]))
+
+    total_days = args.days * len(runs)
+    print(f"\nSimulated {total_days} days in {elapsed:.2f}s ({total_days / elapsed:.0f} days/s)")
+
+
+if __name__ == "__main__":
+    main()
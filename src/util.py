@@ -10,6 +10,9 @@ CART_ITEMS_TABLE_NAME = "cart_items"
 
 INVENTORY_ML_TYPES = ["num_green_ml", "num_red_ml", "num_blue_ml", "num_dark_ml"]
 
+# Game days in week order
+GAME_DAYS = ["Edgeday", "Bloomday", "Arcanaday", "Hearthday", "Crownday", "Blesseday", "Soulday"]
+
 def get_ml_attribute_from_sku(barrel_sku: str) -> str:
     if "red" in barrel_sku.lower():
         return INVENTORY_ML_TYPES[1]
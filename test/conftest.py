@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src import plan_cache
+from src.api import auth
+from src.api.server import create_app
+from src.repository import InMemoryRepository, set_repository
+
+
+@pytest.fixture
+def memory_repo():
+    """
+    An InMemoryRepository installed as the one the routers use, with the
+    plan caches emptied since they're keyed on other repositories' versions.
+    """
+    repo = InMemoryRepository()
+    set_repository(repo)
+    plan_cache.clear()
+    yield repo
+    set_repository(None)
+    plan_cache.clear()
+
+
+@pytest.fixture
+def client(memory_repo):
+    app = create_app()
+    app.dependency_overrides[auth.get_api_key] = lambda: "test"
+    return TestClient(app)
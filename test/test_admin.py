@@ -0,0 +1,13 @@
+def test_reset_cancels_potions_without_a_potion_type(client, memory_repo):
+    with memory_repo.begin():
+        memory_repo.append_ledger([
+            {"transaction_type": "barrel delivery", "num_red_ml_change": 1000, "gold_change": -100},
+            {"transaction_type": "bottling", "potion_type_id": 2, "num_red_ml_change": -1000, "potion_quantity_change": 10},
+            # how resets used to zero potions, before they went per potion type
+            {"transaction_type": "reset", "potion_quantity_change": -10},
+        ])
+
+    assert client.post("/admin/reset").json()["success"] is True
+
+    assert client.get("/inventory/audit").json() == {"potions": 0, "ml_in_barrels": 0, "gold": 100}
+    assert all(potion[8] == 0 for potion in memory_repo.get_potion_stock())
@@ -0,0 +1,161 @@
+import asyncio
+
+from src.api.admission import AdmissionController, RouteClass
+
+
+def controller(total_limit: int = 1, queue_size: int = 5, max_wait: float = 5.0) -> AdmissionController:
+    return AdmissionController(
+        total_limit=total_limit,
+        route_classes=[
+            RouteClass("critical", priority=0, limit=total_limit, queue_size=queue_size, max_wait=max_wait),
+            RouteClass("polling", priority=2, limit=total_limit, queue_size=queue_size, max_wait=max_wait),
+        ],
+        rules=[],
+    )
+
+
+async def handle(admission: AdmissionController, route_class: RouteClass, done: asyncio.Event) -> bool:
+    # acquire and release the way AdmissionMiddleware does around a request
+    if not await admission.acquire(route_class):
+        return False
+    try:
+        await done.wait()
+    finally:
+        admission.release(route_class)
+    return True
+
+
+def assert_idle(admission: AdmissionController):
+    assert admission.active == 0
+    for route_class in admission.route_classes.values():
+        assert route_class.active == 0
+        assert not route_class.waiters
+
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        admission = controller(queue_size=1)
+        critical = admission.route_classes["critical"]
+        done = asyncio.Event()
+
+        running = asyncio.create_task(handle(admission, critical, done))
+        queued = asyncio.create_task(handle(admission, critical, done))
+        await asyncio.sleep(0)
+        assert admission.active == 1
+        assert len(critical.waiters) == 1
+
+        assert await admission.acquire(critical) is False
+        assert critical.rejected == 1
+
+        done.set()
+        assert await running is True
+        assert await queued is True
+        assert_idle(admission)
+
+    asyncio.run(scenario())
+
+
+def test_critical_waiter_is_served_before_polling_waiter():
+    async def scenario():
+        admission = controller()
+        critical = admission.route_classes["critical"]
+        polling = admission.route_classes["polling"]
+        order = []
+
+        async def record(route_class: RouteClass):
+            assert await admission.acquire(route_class)
+            order.append(route_class.name)
+            await asyncio.sleep(0)
+            admission.release(route_class)
+
+        assert await admission.acquire(critical)
+        # polling starts waiting first but critical outranks it
+        waiting = [asyncio.create_task(record(polling)), asyncio.create_task(record(critical))]
+        await asyncio.sleep(0)
+        assert len(polling.waiters) == 1 and len(critical.waiters) == 1
+
+        admission.release(critical)
+        await asyncio.gather(*waiting)
+        assert order == ["critical", "polling"]
+        assert_idle(admission)
+
+    asyncio.run(scenario())
+
+
+def test_rejects_after_waiting_too_long():
+    async def scenario():
+        admission = controller(max_wait=0.01)
+        critical = admission.route_classes["critical"]
+        done = asyncio.Event()
+
+        running = asyncio.create_task(handle(admission, critical, done))
+        await asyncio.sleep(0)
+
+        assert await admission.acquire(critical) is False
+        assert critical.rejected == 1
+        assert not critical.waiters
+
+        done.set()
+        await running
+        assert_idle(admission)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        admission = controller()
+        critical = admission.route_classes["critical"]
+        done = asyncio.Event()
+
+        running = asyncio.create_task(handle(admission, critical, done))
+        queued = asyncio.create_task(handle(admission, critical, done))
+        await asyncio.sleep(0)
+        assert len(critical.waiters) == 1
+
+        # cancelled while still queued
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert not critical.waiters
+
+        done.set()
+        await running
+        assert_idle(admission)
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_as_it_is_granted_does_not_leak_a_slot():
+    async def scenario():
+        admission = controller()
+        critical = admission.route_classes["critical"]
+        done = asyncio.Event()
+        done.set()
+
+        assert await admission.acquire(critical)
+        queued = asyncio.create_task(handle(admission, critical, done))
+        await asyncio.sleep(0)
+
+        # the slot is handed over, then the request is cancelled before it resumes
+        admission.release(critical)
+        assert critical.active == 1
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert_idle(admission)
+
+    asyncio.run(scenario())
+
+
+def test_shed_request_still_carries_cors_headers(client):
+    # shed every polling request straight away
+    polling = client.app.state.admission_controller.route_classes["polling"]
+    polling.limit = 0
+    polling.queue_size = 0
+
+    origin = "https://potion-exchange.vercel.app"
+    response = client.get("/catalog/", headers={"Origin": origin})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.headers["access-control-allow-origin"] == origin
+    assert "retry-after" in response.headers["access-control-expose-headers"].lower()
@@ -0,0 +1,39 @@
+import pytest
+
+from src.api import analytics
+
+
+@pytest.fixture
+def repo(memory_repo):
+    return memory_repo
+
+
+def sell(repo, gold: int):
+    repo.append_ledger([{"transaction_type": "purchase", "potion_type_id": 1, "potion_quantity_change": -1, "gold_change": gold}])
+    repo.refresh_sales_rollups()
+
+
+def test_gold_velocity_divides_by_elapsed_game_hours(repo):
+    # one sale over a whole game day of ticks
+    repo.record_game_time("Edgeday", 0)
+    sell(repo, 48)
+    for hour in range(2, 24, 2):
+        repo.record_game_time("Edgeday", hour)
+
+    velocity = analytics.get_gold_velocity()
+    assert velocity["gold_per_hour"] == 2.0
+    assert velocity["by_hour"] == [{"day": "Edgeday", "hour": 0, "quantity": 1, "gold": 48}]
+
+
+def test_gold_velocity_leaves_sales_before_the_first_tick_out_of_the_rate(repo):
+    sell(repo, 100)
+    repo.record_game_time("Bloomday", 10)
+    sell(repo, 20)
+    repo.record_game_time("Bloomday", 12)
+
+    velocity = analytics.get_gold_velocity()
+    assert velocity["gold_per_hour"] == 5.0
+    assert [slot["day"] for slot in velocity["by_hour"]] == ["unknown", "Bloomday"]
+
+    assert analytics.get_gold_velocity(day="bloomday")["gold_per_hour"] == 5.0
+    assert analytics.get_gold_velocity(day="Edgeday")["gold_per_hour"] == 0.0
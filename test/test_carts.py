@@ -0,0 +1,48 @@
+import pytest
+
+from src.api import carts
+
+
+@pytest.fixture
+def repo(memory_repo):
+    with memory_repo.begin():
+        memory_repo.append_ledger([{"transaction_type": "bottling", "potion_type_id": 2, "potion_quantity_change": 10}])
+    return memory_repo
+
+
+CUSTOMER = {"customer_name": "Ayla", "character_class": "Warrior", "level": 5}
+
+
+def test_batch_rejects_item_added_after_checkout(client, repo):
+    operations = [
+        {"op": "create", "ref": "a", "customer": CUSTOMER},
+        {"op": "set_item", "ref": "a", "item_sku": "RED_POTION_0", "quantity": 2},
+        {"op": "checkout", "ref": "a", "payment": "gold"},
+        {"op": "set_item", "ref": "a", "item_sku": "RED_POTION_0", "quantity": 5},
+    ]
+    results = client.post("/carts/batch", json=operations).json()
+
+    assert results[1] == {"success": True}
+    assert results[2]["total_potions_bought"] == 2
+    assert results[3] == {"error": "Cart already checked out"}
+    assert repo.get_potion_stock()[1][8] == 8
+
+
+def test_batch_checkout_before_any_item_finds_cart_empty(client):
+    operations = [
+        {"op": "create", "ref": "a", "customer": CUSTOMER},
+        {"op": "checkout", "ref": "a", "payment": "gold"},
+        {"op": "set_item", "ref": "a", "item_sku": "RED_POTION_0", "quantity": 1},
+    ]
+    results = client.post("/carts/batch", json=operations).json()
+
+    assert results[1] == {"error": "No items in cart"}
+    assert results[2] == {"error": "Cart already checked out"}
+
+
+def test_batch_rejects_too_many_operations(client, repo):
+    operations = [{"op": "create", "customer": CUSTOMER}] * (carts.MAX_BATCH_OPERATIONS + 1)
+    response = client.post("/carts/batch", json=operations)
+
+    assert response.status_code == 422
+    assert repo.get_cart_customer(1) is None
@@ -0,0 +1,24 @@
+def route_paths(client) -> set:
+    return {route.path for route in client.app.routes}
+
+
+def test_deferred_router_works_on_first_request(client):
+    assert "/admin/reset" not in route_paths(client)
+
+    response = client.post("/admin/reset")
+    assert response.status_code == 200
+    assert response.json()["success"] is True
+    assert "/admin/reset" in route_paths(client)
+
+
+def test_prefix_match_respects_path_segments(client):
+    # neither shares the /admin path segment, so neither loads the admin router
+    assert client.get("/adminx/reset").status_code == 404
+    assert client.get("/admission").status_code == 200
+    assert "/admin/reset" not in route_paths(client)
+
+
+def test_openapi_lists_deferred_routes(client):
+    paths = client.get("/openapi.json").json()["paths"]
+    assert "/admin/reset" in paths
+    assert "/analytics/top_sellers" in paths
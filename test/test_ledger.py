@@ -0,0 +1,130 @@
+import pytest
+
+from src.ledger import LEDGER_COLUMNS, LedgerWriter
+
+
+class RecordingRepository:
+    def __init__(self):
+        self.appended = []
+
+    def append_ledger(self, entries: list[dict]) -> None:
+        self.appended.append(entries)
+
+
+def test_deltas_net_into_one_row_per_key():
+    writer = LedgerWriter()
+    writer.add("barrel delivery", num_red_ml_change=500, gold_change=-100)
+    writer.add("barrel delivery", num_red_ml_change=500, num_dark_ml_change=200, gold_change=-150)
+    writer.add("bottling", 2, num_red_ml_change=-100, potion_quantity_change=1)
+    writer.add("bottling", 2, num_red_ml_change=-200, potion_quantity_change=2)
+    writer.add("bottling", 3, potion_quantity_change=1)
+
+    rows = writer.rows()
+    assert all(list(row) == LEDGER_COLUMNS for row in rows)
+    assert rows == [
+        {
+            "transaction_type": "barrel delivery", "potion_type_id": None, "order_id": None,
+            "num_red_ml_change": 1000, "num_blue_ml_change": 0, "num_green_ml_change": 0,
+            "num_dark_ml_change": 200, "gold_change": -250, "potion_quantity_change": 0,
+        },
+        {
+            "transaction_type": "bottling", "potion_type_id": 2, "order_id": None,
+            "num_red_ml_change": -300, "num_blue_ml_change": 0, "num_green_ml_change": 0,
+            "num_dark_ml_change": 0, "gold_change": 0, "potion_quantity_change": 3,
+        },
+        {
+            "transaction_type": "bottling", "potion_type_id": 3, "order_id": None,
+            "num_red_ml_change": 0, "num_blue_ml_change": 0, "num_green_ml_change": 0,
+            "num_dark_ml_change": 0, "gold_change": 0, "potion_quantity_change": 1,
+        },
+    ]
+
+
+def test_rows_that_cancel_out_are_dropped():
+    writer = LedgerWriter()
+    writer.add("reset", gold_change=0)
+    writer.add("reset", 2, potion_quantity_change=4)
+    writer.add("reset", 2, potion_quantity_change=-4)
+    writer.add("reset", 3, potion_quantity_change=-1)
+
+    assert [(row["potion_type_id"], row["potion_quantity_change"]) for row in writer.rows()] == [(3, -1)]
+
+
+def test_rows_are_stamped_with_the_order():
+    writer = LedgerWriter(order_id=7)
+    writer.add("purchase", 2, potion_quantity_change=-1, gold_change=50)
+    writer.add("purchase", 2, order_id=8, potion_quantity_change=-2, gold_change=100)
+
+    rows = writer.rows()
+    assert [(row["order_id"], row["potion_quantity_change"]) for row in rows] == [(7, -1), (8, -2)]
+
+
+@pytest.mark.parametrize(
+    "args, changes",
+    [
+        (("",), {"gold_change": 1}),
+        ((None,), {"gold_change": 1}),
+        (("bottling", "2"), {"potion_quantity_change": 1}),
+        (("bottling", True), {"potion_quantity_change": 1}),
+        (("barrel delivery",), {"num_purple_ml_change": 500}),
+        (("barrel delivery",), {"gold_change": 1.5}),
+        (("barrel delivery",), {"gold_change": "10"}),
+        (("barrel delivery",), {"gold_change": True}),
+    ],
+)
+def test_rejects_invalid_rows(args, changes):
+    writer = LedgerWriter()
+    with pytest.raises(ValueError):
+        writer.add(*args, **changes)
+    assert writer.rows() == []
+
+
+def test_flush_writes_once_and_starts_over():
+    repo = RecordingRepository()
+    writer = LedgerWriter(order_id=3)
+    writer.add("barrel delivery", num_green_ml_change=500, gold_change=-100)
+    writer.add("reset", gold_change=0)
+
+    assert writer.flush(repo) == 1
+    assert len(repo.appended) == 1
+    assert repo.appended[0][0]["order_id"] == 3
+    assert writer.rows() == []
+
+
+def ledger_rows(repo, start: int) -> list[tuple]:
+    # (potion_type_id, order_id, changes...) of the rows appended since start
+    columns = [column for column in LEDGER_COLUMNS if column != "transaction_type"]
+    return list(zip(*(repo.ledger[column][start:] for column in columns)))
+
+
+def test_barrel_delivery_charges_every_barrel(client, memory_repo):
+    start = len(memory_repo.ledger["order_id"])
+    barrels = [
+        {"sku": "SMALL_RED_BARREL", "ml_per_barrel": 500, "potion_type": [1, 0, 0, 0], "price": 100, "quantity": 3},
+        {"sku": "MEDIUM_DARK_BARREL", "ml_per_barrel": 2500, "potion_type": [0, 0, 0, 1], "price": 750, "quantity": 2},
+    ]
+    assert client.post("/barrels/deliver/7", json=barrels).status_code == 200
+
+    balances = memory_repo.get_balances()
+    assert (balances["num_red_ml"], balances["num_dark_ml"], balances["gold"]) == (1500, 5000, -1800)
+    # red, blue, green, dark, gold, potions
+    assert ledger_rows(memory_repo, start) == [(0, 7, 1500, 0, 0, 5000, -1800, 0)]
+
+
+def test_bottling_deducts_each_potions_own_ml(client, memory_repo):
+    with memory_repo.begin():
+        memory_repo.append_ledger([
+            {"transaction_type": "barrel delivery", "num_red_ml_change": 1000, "num_green_ml_change": 1000, "num_blue_ml_change": 200},
+        ])
+    start = len(memory_repo.ledger["order_id"])
+
+    potions = [{"potion_type": [100, 0, 0, 0], "quantity": 3}, {"potion_type": [0, 50, 50, 0], "quantity": 2}]
+    response = client.post("/bottler/deliver/9", json=potions).json()
+    assert response["message"] == "Potions delivered successfully"
+
+    balances = memory_repo.get_balances()
+    assert (balances["num_red_ml"], balances["num_green_ml"], balances["num_blue_ml"]) == (700, 900, 100)
+    assert balances["potions"] == 5
+    stock = {potion[1]: potion[8] for potion in memory_repo.get_potion_stock()}
+    assert (stock["RED_POTION_0"], stock["TURQUOISE_POTION_0"]) == (3, 2)
+    assert ledger_rows(memory_repo, start) == [(2, 9, -300, 0, 0, 0, 0, 3), (5, 9, 0, -100, -100, 0, 0, 2)]
@@ -0,0 +1,75 @@
+from src import plan_cache
+from src.api import barrels, bottler
+
+CATALOG = [
+    {"sku": "SMALL_RED_BARREL", "ml_per_barrel": 500, "potion_type": [1, 0, 0, 0], "price": 100, "quantity": 10},
+    {"sku": "SMALL_GREEN_BARREL", "ml_per_barrel": 500, "potion_type": [0, 1, 0, 0], "price": 100, "quantity": 10},
+]
+
+# a plan no planner would produce, to tell a cached plan from a recomputed one
+PRECOMPUTED_BOTTLES = [([0, 0, 0, 100], 99)]
+PRECOMPUTED_BARRELS = [("SMALL_GREEN_BARREL", 99)]
+
+
+def stock_up(repo):
+    with repo.begin():
+        repo.append_ledger([{"transaction_type": "barrel delivery", "num_red_ml_change": 1000, "gold_change": 500}])
+
+
+def catalog_key(catalog: list[dict]) -> tuple:
+    return barrels.wholesale_catalog_key([barrels.Barrel(**barrel) for barrel in catalog])
+
+
+def test_bottle_plan_is_reused_until_the_ledger_changes(client, memory_repo):
+    stock_up(memory_repo)
+    plan_cache.put("bottle", memory_repo.ledger_version(), PRECOMPUTED_BOTTLES)
+
+    assert client.post("/bottler/plan").json() == [{"potion_type": [0, 0, 0, 100], "quantity": 99}]
+
+    stock_up(memory_repo)
+    plan = client.post("/bottler/plan").json()
+    assert plan == [
+        {"potion_type": potion_type, "quantity": quantity}
+        for potion_type, quantity in bottler.compute_bottle_plan(memory_repo)
+    ]
+    assert plan and plan != [{"potion_type": [0, 0, 0, 100], "quantity": 99}]
+
+
+def test_barrel_plan_is_reused_for_the_same_ledger_and_catalog(client, memory_repo):
+    stock_up(memory_repo)
+    plan_cache.put("barrels", (memory_repo.ledger_version(), catalog_key(CATALOG)), PRECOMPUTED_BARRELS)
+
+    assert client.post("/barrels/plan", json=CATALOG).json() == [{"sku": "SMALL_GREEN_BARREL", "quantity": 99}]
+
+    # a different catalog at the same ledger version is planned afresh
+    cheaper = [dict(barrel, price=90) for barrel in CATALOG]
+    assert client.post("/barrels/plan", json=cheaper).json() != [{"sku": "SMALL_GREEN_BARREL", "quantity": 99}]
+
+
+def test_barrel_plan_is_recomputed_after_a_ledger_write(client, memory_repo):
+    stock_up(memory_repo)
+    plan_cache.put("barrels", (memory_repo.ledger_version(), catalog_key(CATALOG)), PRECOMPUTED_BARRELS)
+
+    stock_up(memory_repo)
+    plan = client.post("/barrels/plan", json=CATALOG).json()
+    barrels_catalog = [barrels.Barrel(**barrel) for barrel in CATALOG]
+    assert plan == [
+        {"sku": sku, "quantity": quantity}
+        for sku, quantity in barrels.compute_wholesale_purchase_plan(memory_repo, barrels_catalog)
+    ]
+
+
+def test_post_time_records_the_tick_and_precomputes_plans(client, memory_repo):
+    stock_up(memory_repo)
+    # the barrel plan is precomputed for the last wholesale catalog seen
+    client.post("/barrels/plan", json=CATALOG)
+    stock_up(memory_repo)
+
+    response = client.post("/info/current_time", json={"day": "Hearthday", "hour": 14})
+    assert response.status_code == 200
+    assert memory_repo.get_game_time() == ("Hearthday", 14)
+
+    ledger_version = memory_repo.ledger_version()
+    assert plan_cache.get("bottle", ledger_version) == bottler.compute_bottle_plan(memory_repo)
+    assert plan_cache.get("barrels", (ledger_version, catalog_key(CATALOG))) is not None
+    assert plan_cache.get("prices", ledger_version) is not None
@@ -0,0 +1,111 @@
+import pytest
+
+from src import pricing
+
+CUSTOMER = {"customer_name": "Ayla", "character_class": "Warrior", "level": 5}
+
+NO_ACTIVITY = {"sales": {}, "barrel_gold": 0, "barrel_ml": 0}
+
+
+def potion(potion_type_id: int, listed: int, stock: int = 0) -> tuple:
+    # a get_potion_stock() row
+    return (potion_type_id, f"POTION_{potion_type_id}", f"potion {potion_type_id}", listed, 100, 0, 0, 0, stock)
+
+
+def test_listed_price_is_kept_without_sales_or_stock():
+    # with nothing sold the average is zero and demand leaves prices alone
+    prices = pricing.compute_prices([potion(1, 50), potion(2, 30)], NO_ACTIVITY)
+    assert prices == {"POTION_1": 50, "POTION_2": 30}
+
+
+def test_price_is_raised_to_cover_ml_cost():
+    # 1 gold per ml puts the floor at 100 ml * 1.2 = 120
+    activity = {"sales": {}, "barrel_gold": 500, "barrel_ml": 500}
+    prices = pricing.compute_prices([potion(1, 50), potion(2, 200)], activity)
+    assert prices == {"POTION_1": 120, "POTION_2": 200}
+
+    # before any barrels the default ml cost applies
+    floor = pricing.compute_prices([potion(1, 1)], NO_ACTIVITY)["POTION_1"]
+    assert floor == pytest.approx(pricing.DEFAULT_ML_COST * pricing.ML_PER_POTION * pricing.MIN_MARGIN)
+
+
+def test_demand_moves_price_relative_to_average_sales():
+    activity = {"sales": {1: 3, 2: 1}, "barrel_gold": 0, "barrel_ml": 0}
+    prices = pricing.compute_prices([potion(1, 40), potion(2, 40)], activity)
+    # 1.5x and 0.5x the average sales rate
+    assert prices == {"POTION_1": 45, "POTION_2": 35}
+
+    # a runaway seller is capped at MAX_DEMAND times the average
+    activity = {"sales": {1: 100}, "barrel_gold": 0, "barrel_ml": 0}
+    prices = pricing.compute_prices([potion(potion_type_id, 40) for potion_type_id in range(1, 5)], activity)
+    assert prices["POTION_1"] == round(40 * (1 + pricing.DEMAND_WEIGHT * (pricing.MAX_DEMAND - 1)))
+
+
+def test_stock_discounts_price_up_to_capacity():
+    prices = pricing.compute_prices(
+        [potion(1, 100, stock=25), potion(2, 100, stock=50), potion(3, 100, stock=80), potion(4, 100, stock=-5)],
+        NO_ACTIVITY,
+    )
+    assert prices == {"POTION_1": 90, "POTION_2": 80, "POTION_3": 80, "POTION_4": 100}
+
+    # the discount never takes a price below the ml-cost floor
+    assert pricing.compute_prices([potion(1, 25, stock=50)], NO_ACTIVITY) == {"POTION_1": 24}
+
+
+def test_price_is_capped():
+    assert pricing.compute_prices([potion(1, 1000)], NO_ACTIVITY) == {"POTION_1": pricing.MAX_PRICE}
+
+    # demand can't push a price past the cap either
+    activity = {"sales": {2: 10}, "barrel_gold": 0, "barrel_ml": 0}
+    prices = pricing.compute_prices([potion(1, 100), potion(2, 450)], activity)
+    assert prices == {"POTION_1": 75, "POTION_2": pricing.MAX_PRICE}
+
+
+def test_current_prices_are_recomputed_after_a_ledger_write(memory_repo):
+    with memory_repo.begin():
+        memory_repo.append_ledger([{"transaction_type": "bottling", "potion_type_id": 2, "potion_quantity_change": 10}])
+    prices = pricing.current_prices(memory_repo)
+    assert pricing.current_prices(memory_repo) is prices
+
+    with memory_repo.begin():
+        memory_repo.append_ledger([{"transaction_type": "bottling", "potion_type_id": 2, "potion_quantity_change": 40}])
+    after = pricing.current_prices(memory_repo)
+    assert after == pricing.compute_prices(memory_repo.get_potion_stock(), memory_repo.get_recent_activity(pricing.ACTIVITY_WINDOW))
+    assert after["RED_POTION_0"] < prices["RED_POTION_0"]
+
+
+@pytest.fixture
+def selling(memory_repo):
+    # red sells faster than the rest, so its price is off its listed 50
+    with memory_repo.begin():
+        memory_repo.append_ledger([
+            {"transaction_type": "bottling", "potion_type_id": 2, "potion_quantity_change": 10},
+            {"transaction_type": "purchase", "potion_type_id": 2, "potion_quantity_change": -3, "gold_change": 150},
+        ])
+    return memory_repo
+
+
+def catalog_price(client, sku: str) -> int:
+    return next(item["price"] for item in client.get("/catalog/").json() if item["sku"] == sku)
+
+
+def test_cart_item_is_charged_the_catalog_price(client, selling):
+    price = catalog_price(client, "RED_POTION_0")
+    assert price != 50
+
+    cart_id = client.post("/carts/", json=CUSTOMER).json()["cart_id"]
+    assert client.post(f"/carts/{cart_id}/items/RED_POTION_0", json={"quantity": 2}).json() == {"success": True}
+    assert [item[1:3] for item in selling.get_cart_items(cart_id)] == [(2, price)]
+
+
+def test_batch_item_is_charged_the_catalog_price(client, selling):
+    price = catalog_price(client, "RED_POTION_0")
+    assert price != 50
+
+    operations = [
+        {"op": "create", "ref": "a", "customer": CUSTOMER},
+        {"op": "set_item", "ref": "a", "item_sku": "RED_POTION_0", "quantity": 2},
+    ]
+    results = client.post("/carts/batch", json=operations).json()
+    assert results[1] == {"success": True}
+    assert [item[1:3] for item in selling.get_cart_items(results[0]["cart_id"])] == [(2, price)]
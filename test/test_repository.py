@@ -0,0 +1,290 @@
+"""
+Contract tests run against every repository backend. The in-memory engine
+always runs; the Postgres one runs when POSTGRES_URI is set, inside a
+transaction that is rolled back afterwards.
+"""
+import os
+import threading
+import uuid
+
+import pytest
+
+from src.repository import InMemoryRepository, PostgresRepository
+
+
+@pytest.fixture(params=["memory", "postgres"])
+def repo(request):
+    if request.param == "memory":
+        with InMemoryRepository().begin() as repo:
+            yield repo
+        return
+
+    if not os.environ.get("POSTGRES_URI"):
+        pytest.skip("POSTGRES_URI is not set")
+    from src import database as db
+
+    with db.get_engine().connect() as connection:
+        transaction = connection.begin()
+        try:
+            yield PostgresRepository(connection)
+        finally:
+            transaction.rollback()
+
+
+@pytest.fixture
+def customer():
+    # a unique name keeps searches clear of carts already in the database
+    return f"test_{uuid.uuid4().hex[:12]}"
+
+
+def potion_ids(repo) -> list[int]:
+    return [potion[0] for potion in repo.get_potion_types()]
+
+
+def stock_by_id(repo) -> dict:
+    return {potion[0]: potion[8] for potion in repo.get_potion_stock()}
+
+
+def test_append_ledger_updates_balances_and_stock(repo):
+    first, second = potion_ids(repo)[:2]
+    balances = repo.get_balances()
+    stock = stock_by_id(repo)
+
+    repo.append_ledger([
+        {"transaction_type": "barrel delivery", "num_red_ml_change": 500, "num_dark_ml_change": 200, "gold_change": -120},
+        {"transaction_type": "bottling", "potion_type_id": first, "num_red_ml_change": -300, "potion_quantity_change": 3},
+        {"transaction_type": "bottling", "potion_type_id": second, "potion_quantity_change": 2},
+    ])
+
+    after = repo.get_balances()
+    assert after["num_red_ml"] - balances["num_red_ml"] == 200
+    assert after["num_dark_ml"] - balances["num_dark_ml"] == 200
+    assert after["num_green_ml"] == balances["num_green_ml"]
+    assert after["num_blue_ml"] == balances["num_blue_ml"]
+    assert after["gold"] - balances["gold"] == -120
+    assert after["potions"] - balances["potions"] == 5
+
+    after_stock = stock_by_id(repo)
+    assert after_stock[first] - stock[first] == 3
+    assert after_stock[second] - stock[second] == 2
+
+
+def test_append_ledger_counts_potions_without_a_potion_type(repo):
+    balances = repo.get_balances()
+    repo.append_ledger([{"transaction_type": "reset", "potion_quantity_change": -4}])
+    assert repo.get_balances()["potions"] - balances["potions"] == -4
+
+
+def test_add_cart_item_merges_same_potion(repo, customer):
+    first, second = potion_ids(repo)[:2]
+    cart_id = repo.create_cart(customer)
+    assert repo.get_cart_customer(cart_id) == customer
+
+    repo.add_cart_item(cart_id, first, 2, 40)
+    repo.add_cart_item(cart_id, first, 3, 40)
+    repo.add_cart_item(cart_id, second, 1, 25)
+
+    items = sorted(item[:3] for item in repo.get_cart_items(cart_id))
+    assert items == sorted([(first, 5, 40), (second, 1, 25)])
+
+
+def test_add_cart_item_keeps_each_quoted_price(repo, customer):
+    first = potion_ids(repo)[0]
+    cart_id = repo.create_cart(customer)
+
+    repo.add_cart_item(cart_id, first, 2, 42)
+    repo.add_cart_item(cart_id, first, 1, 49)
+    repo.add_cart_items([(cart_id, first, 1, 42), (cart_id, first, 1, 55), (cart_id, first, 2, 55)])
+
+    items = sorted((item[:3] for item in repo.get_cart_items(cart_id)), key=lambda item: item[2])
+    assert items == [(first, 3, 42), (first, 1, 49), (first, 3, 55)]
+    assert repo.checkout_carts([cart_id]) == {cart_id: (7, 3 * 42 + 49 + 3 * 55)}
+
+
+def test_checkout_carts_totals_and_deletes(repo, customer):
+    first, second = potion_ids(repo)[:2]
+    balances = repo.get_balances()
+    stock = stock_by_id(repo)
+
+    full = repo.create_cart(customer)
+    repo.add_cart_item(full, first, 2, 30)
+    repo.add_cart_item(full, second, 1, 50)
+    other = repo.create_cart(customer)
+    repo.add_cart_item(other, first, 1, 30)
+    empty = repo.create_cart(customer)
+
+    totals = repo.checkout_carts([full, other, empty])
+    assert totals == {full: (3, 110), other: (1, 30)}
+
+    # checked out carts are gone, the empty one is left alone
+    assert repo.get_cart_customer(full) is None
+    assert repo.get_cart_customer(other) is None
+    assert repo.get_cart_customer(empty) == customer
+    assert repo.get_cart_items(full) == []
+
+    after = repo.get_balances()
+    assert after["gold"] - balances["gold"] == 140
+    assert after["potions"] - balances["potions"] == -4
+    after_stock = stock_by_id(repo)
+    assert after_stock[first] - stock[first] == -3
+    assert after_stock[second] - stock[second] == -1
+
+
+def test_checkout_carts_ignores_unknown_and_empty(repo, customer):
+    empty = repo.create_cart(customer)
+    assert repo.checkout_carts([]) == {}
+    assert repo.checkout_carts([empty, 10**9]) == {}
+
+
+def test_search_cart_items_orders_and_pages(repo, customer):
+    first = potion_ids(repo)[0]
+    for quantity in (3, 1, 4, 2):
+        cart_id = repo.create_cart(f"{customer}_{quantity}")
+        repo.add_cart_item(cart_id, first, quantity, 10)
+
+    def quantities(sort_order, limit, offset):
+        rows = repo.search_cart_items(customer, "", "line_item_total", sort_order, limit, offset)
+        return [row[2] for row in rows]
+
+    assert quantities("asc", 10, 0) == [1, 2, 3, 4]
+    assert quantities("desc", 2, 0) == [4, 3]
+    assert quantities("desc", 2, 2) == [2, 1]
+    assert quantities("desc", 2, 4) == []
+
+    rows = repo.search_cart_items(customer, "", "customer_name", "desc", 10, 0)
+    assert [row[1] for row in rows] == [f"{customer}_{quantity}" for quantity in (4, 3, 2, 1)]
+
+    sku = repo.get_potion_types()[0][1]
+    assert all(row[0] == sku for row in rows)
+    assert repo.search_cart_items(customer, "NO_SUCH_SKU", "timestamp", "desc", 10, 0) == []
+
+
+def test_get_recent_activity(repo):
+    first, second = potion_ids(repo)[:2]
+    repo.append_ledger([
+        {"transaction_type": "barrel delivery", "num_red_ml_change": 500, "num_blue_ml_change": 100, "gold_change": -60},
+        {"transaction_type": "purchase", "potion_type_id": first, "potion_quantity_change": -2, "gold_change": 80},
+        {"transaction_type": "purchase", "potion_type_id": first, "potion_quantity_change": -1, "gold_change": 40},
+        {"transaction_type": "bottling", "potion_type_id": second, "num_red_ml_change": -100, "potion_quantity_change": 1},
+        {"transaction_type": "purchase", "potion_type_id": second, "potion_quantity_change": -1, "gold_change": 50},
+    ])
+
+    activity = repo.get_recent_activity(5)
+    assert activity["sales"] == {first: 3, second: 1}
+    assert activity["barrel_gold"] == 60
+    assert activity["barrel_ml"] == 600
+
+    # the window only reaches back over the newest rows
+    activity = repo.get_recent_activity(2)
+    assert activity["sales"] == {second: 1}
+    assert activity["barrel_gold"] == 0
+    assert activity["barrel_ml"] == 0
+
+
+def test_ledger_version_changes_with_every_write(repo, customer):
+    first = potion_ids(repo)[0]
+    version = repo.ledger_version()
+    repo.get_balances()
+    assert repo.ledger_version() == version
+
+    repo.append_ledger([{"transaction_type": "bottling", "potion_type_id": first, "potion_quantity_change": 1}])
+    after_bottling = repo.ledger_version()
+    assert after_bottling != version
+
+    cart_id = repo.create_cart(customer)
+    repo.add_cart_item(cart_id, first, 1, 10)
+    repo.checkout_carts([cart_id])
+    assert repo.ledger_version() not in (version, after_bottling)
+
+
+def rollup_totals(repo, potion_type_id: int) -> tuple:
+    rows = [row for row in repo.get_sales_rollups() if row[0] == potion_type_id]
+    return sum(row[4] for row in rows), sum(row[5] for row in rows)
+
+
+def test_refresh_sales_rollups_folds_each_purchase_once(repo):
+    first, second = potion_ids(repo)[:2]
+    repo.refresh_sales_rollups()
+    before = rollup_totals(repo, first)
+
+    repo.record_game_time("Edgeday", 4)
+    repo.append_ledger([
+        {"transaction_type": "purchase", "potion_type_id": first, "potion_quantity_change": -2, "gold_change": 70},
+        {"transaction_type": "bottling", "potion_type_id": first, "potion_quantity_change": 5},
+        {"transaction_type": "purchase", "potion_type_id": second, "potion_quantity_change": -1, "gold_change": 30},
+    ])
+    repo.refresh_sales_rollups()
+    repo.refresh_sales_rollups()
+    quantity, gold = rollup_totals(repo, first)
+    assert (quantity - before[0], gold - before[1]) == (2, 70)
+
+    repo.append_ledger([{"transaction_type": "purchase", "potion_type_id": first, "potion_quantity_change": -1, "gold_change": 35}])
+    repo.refresh_sales_rollups()
+    quantity, gold = rollup_totals(repo, first)
+    assert (quantity - before[0], gold - before[1]) == (3, 105)
+
+
+@pytest.mark.skipif(not os.environ.get("POSTGRES_URI"), reason="POSTGRES_URI is not set")
+def test_sales_rollups_include_purchases_that_commit_late():
+    """
+    A purchase that gets the lower ledger id but commits after a later one
+    must still be folded in, even if a refresh runs in between. This test
+    commits, so it removes its ledger rows and rollup counts afterwards.
+    """
+    from src import database as db
+
+    engine = db.get_engine()
+    marker = -int(uuid.uuid4().hex[:7], 16)  # order id no real order uses
+
+    def refresh() -> dict:
+        with engine.begin() as connection:
+            repo = PostgresRepository(connection)
+            repo.refresh_sales_rollups()
+            return {row[:4]: row[4] for row in repo.get_sales_rollups()}
+
+    def append(connection):
+        potion_type_id = PostgresRepository(connection).get_potion_types()[0][0]
+        PostgresRepository(connection).append_ledger([{
+            "transaction_type": "purchase",
+            "potion_type_id": potion_type_id,
+            "order_id": marker,
+            "potion_quantity_change": -1,
+        }])
+
+    def append_and_commit():
+        with engine.begin() as connection:
+            append(connection)
+
+    before = refresh()
+    try:
+        with engine.connect() as early:
+            transaction = early.begin()
+            append(early)
+
+            # the later write would take the next id and commit first
+            late = threading.Thread(target=append_and_commit)
+            late.start()
+            late.join(0.5)
+            refresh()
+
+            transaction.commit()
+        late.join()
+
+        after = refresh()
+        assert sum(after.values()) - sum(before.values()) == 2
+    finally:
+        after = refresh()
+        with engine.begin() as connection:
+            repo = PostgresRepository(connection)
+            repo._execute("DELETE FROM inventory_ledger WHERE order_id = :marker", {"marker": marker})
+            for key, quantity in after.items():
+                potion_type_id, _, day, hour = key
+                added = quantity - before.get(key, 0)
+                if added:
+                    repo._execute(
+                        """
+                        UPDATE sales_rollups SET quantity = quantity - :added
+                        WHERE potion_type_id = :potion_type_id AND day = :day AND hour = :hour
+                        """,
+                        {"added": added, "potion_type_id": potion_type_id, "day": day, "hour": hour},
+                    )